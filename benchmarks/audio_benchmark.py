@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.audio_utils import AudioEffects
+
+# Standardszenarien: Signallängen (s), Abtastraten (Hz) und IR-Längen (s)
+DEFAULT_DURATIONS = [10, 60, 300, 1200]
+DEFAULT_RATES = [44100, 48000]
+DEFAULT_IR_SECONDS = [2.0, 6.0]
+EFFECTS = ['slow', 'convolve', 'room', 'stereo', 'mono']
+
+
+def make_signal(seconds: float, rate: int, channels: int, seed: int = 0) -> np.ndarray:
+    """
+    Erzeugt ein synthetisches int16-Signal (Sinusgemisch mit Rauschen).
+
+    :param seconds: Länge in Sekunden.
+    :param rate: Abtastrate.
+    :param channels: Kanalzahl (1 = 1D-Array).
+    :param seed: Startwert des Zufallsgenerators.
+    :return: Signal als int16-Array.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n, dtype=np.float32) / rate
+    out = np.empty((n, channels), dtype=np.int16)
+    for c in range(channels):
+        tone = 0.4 * np.sin(2 * np.pi * (220 + 110 * c) * t) + 0.1 * rng.standard_normal(n, dtype=np.float32)
+        out[:, c] = (tone * 32767 * 0.8).astype(np.int16)
+    return out[:, 0] if channels == 1 else out
+
+
+def make_impulse(seconds: float, rate: int, channels: int, seed: int = 1) -> np.ndarray:
+    """
+    Erzeugt eine synthetische Impulsantwort (exponentiell abklingendes Rauschen).
+
+    :param seconds: Länge in Sekunden.
+    :param rate: Abtastrate.
+    :param channels: Kanalzahl (1 = 1D-Array).
+    :param seed: Startwert des Zufallsgenerators.
+    :return: Impulsantwort als float32-Array.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    decay = np.exp(-6.9 * np.arange(n, dtype=np.float32) / n)[:, None]
+    h = (rng.standard_normal((n, channels), dtype=np.float32) * decay).astype(np.float32)
+    return h[:, 0] if channels == 1 else h
+
+
+def measure(func, *args, repeat: int = 1, **kwargs) -> tuple[float, float]:
+    """
+    Misst Laufzeit (bester Durchlauf) und Spitzenspeicher (tracemalloc) eines Aufrufs.
+
+    :param func: Zu messende Funktion.
+    :param args: Positionsargumente.
+    :param repeat: Anzahl Wiederholungen.
+    :param kwargs: Schlüsselwortargumente.
+    :return: Tuple(Sekunden, Spitzenspeicher in MB).
+    """
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del result
+    return best, peak / 2 ** 20
+
+
+def scenarios(durations: list[float], rates: list[int], ir_seconds: list[float], effects: list[str]):
+    """
+    Erzeugt alle Messszenarien.
+
+    :param durations: Signallängen in Sekunden.
+    :param rates: Abtastraten.
+    :param ir_seconds: IR-Längen in Sekunden (nur convolve).
+    :param effects: Zu messende Effekte.
+    :return: Iterator über Szenario-Dicts.
+    """
+    for rate in rates:
+        for seconds in durations:
+            for effect in effects:
+                if effect == 'convolve':
+                    for ir in ir_seconds:
+                        for channels, ir_channels in ((1, 1), (2, 1), (2, 2)):
+                            yield {'effect': effect, 'rate': rate, 'seconds': seconds, 'channels': channels,
+                                   'ir_seconds': ir, 'ir_channels': ir_channels}
+                elif effect == 'stereo':
+                    yield {'effect': effect, 'rate': rate, 'seconds': seconds, 'channels': 1}
+                elif effect == 'mono':
+                    yield {'effect': effect, 'rate': rate, 'seconds': seconds, 'channels': 2}
+                else:
+                    for channels in (1, 2):
+                        yield {'effect': effect, 'rate': rate, 'seconds': seconds, 'channels': channels}
+
+
+def run_scenario(scenario: dict, repeat: int) -> dict:
+    """
+    Führt ein Szenario aus.
+
+    :param scenario: Szenario-Dict.
+    :param repeat: Anzahl Wiederholungen.
+    :return: Szenario-Dict ergänzt um Messwerte.
+    """
+    rate = scenario['rate']
+    x = make_signal(scenario['seconds'], rate, scenario['channels'])
+    effect = scenario['effect']
+    if effect == 'slow':
+        elapsed, peak = measure(AudioEffects.slow_audio, x, 0.85, repeat=repeat)
+    elif effect == 'convolve':
+        h = make_impulse(scenario['ir_seconds'], rate, scenario['ir_channels'])
+        elapsed, peak = measure(AudioEffects.refined_convolve_audio, x, h, repeat=repeat)
+    elif effect == 'room':
+        elapsed, peak = measure(AudioEffects.algorithmic_reverb, x, rate, repeat=repeat)
+    elif effect == 'stereo':
+        elapsed, peak = measure(AudioEffects.mono_to_stereo, x, rate, repeat=repeat)
+    else:
+        elapsed, peak = measure(AudioEffects.stereo_to_mono, x, repeat=repeat)
+    return dict(scenario, time_s=round(elapsed, 4), peak_mb=round(peak, 2),
+                input_mb=round(x.nbytes / 2 ** 20, 2), realtime_factor=round(scenario['seconds'] / elapsed, 1))
+
+
+def scenario_key(result: dict) -> tuple:
+    """
+    Schlüssel zum Abgleich von Ergebnissen zwischen Läufen.
+
+    :param result: Ergebnis-Dict.
+    :return: Tuple der Szenario-Parameter.
+    """
+    return (result['effect'], result['rate'], result['seconds'], result['channels'],
+            result.get('ir_seconds'), result.get('ir_channels'))
+
+
+def describe(result: dict) -> str:
+    """
+    Kurzbeschreibung eines Szenarios.
+
+    :param result: Szenario- oder Ergebnis-Dict.
+    :return: Beschreibung.
+    """
+    text = f"{result['effect']} {result['seconds']}s@{result['rate']} {result['channels']}ch"
+    if 'ir_seconds' in result:
+        text += f" IR {result['ir_seconds']}s/{result['ir_channels']}ch"
+    return text
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    """
+    Vergleicht Ergebnisse mit einem früheren Lauf und gibt die Verhältnisse aus.
+
+    :param results: Aktuelle Ergebnisse.
+    :param baseline_path: Pfad der JSON-Datei des früheren Laufs.
+    :return: None
+    """
+    with open(baseline_path, 'r') as f:
+        baseline = {scenario_key(r): r for r in json.load(f)['results']}
+    print(f'\nVergleich mit {baseline_path} (Faktor < 1 = besser):')
+    for r in results:
+        old = baseline.get(scenario_key(r))
+        if old is None:
+            continue
+        t_ratio = r['time_s'] / old['time_s'] if old['time_s'] else float('nan')
+        m_ratio = r['peak_mb'] / old['peak_mb'] if old['peak_mb'] else float('nan')
+        print(f'{describe(r):<48} Zeit x{t_ratio:5.2f}  Speicher x{m_ratio:5.2f}')
+
+
+def main():
+    """
+    Kommandozeilen-Einstieg: misst alle Szenarien und schreibt die Ergebnisse als JSON.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Benchmark der AudioEffects mit synthetischen Signalen.')
+    parser.add_argument('--durations', type=float, nargs='+', default=DEFAULT_DURATIONS, help='Signallängen in s')
+    parser.add_argument('--rates', type=int, nargs='+', default=DEFAULT_RATES, help='Abtastraten in Hz')
+    parser.add_argument('--ir-seconds', type=float, nargs='+', default=DEFAULT_IR_SECONDS, help='IR-Längen in s')
+    parser.add_argument('--effects', nargs='+', choices=EFFECTS, default=EFFECTS, help='Zu messende Effekte')
+    parser.add_argument('--repeat', type=int, default=1, help='Wiederholungen je Szenario (bester Lauf zählt)')
+    parser.add_argument('--quick', action='store_true', help='Nur kurze Signale (10 s und 60 s)')
+    parser.add_argument('--output', default='audio_benchmark.json', help='Ausgabedatei (JSON)')
+    parser.add_argument('--compare', help='JSON-Datei eines früheren Laufs zum Vergleich')
+    args = parser.parse_args()
+    durations = [d for d in args.durations if d <= 60] if args.quick else args.durations
+
+    results = []
+    for scenario in scenarios(durations, args.rates, args.ir_seconds, args.effects):
+        result = run_scenario(scenario, args.repeat)
+        results.append(result)
+        print(f"{describe(result):<48} {result['time_s']:8.3f} s  {result['peak_mb']:9.1f} MB  "
+              f"{result['realtime_factor']:7.1f}x Echtzeit")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'Ergebnisse gespeichert: {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,31 @@
+import asyncio
 import discord
 import io
-import numpy as np
+import os
+import zipfile
 from discord.ext import commands
-from scipy.io import wavfile
-from utils.audio_utils import AudioEffects
+from typing import Literal, Optional
+from utils.audio_utils import (BLOCK_SIZE, AudioEffects, AudioEncoder, AudioUpload, EffectChain, OUTPUT_FORMATS,
+                               audio_pool, ir_cache, result_cache)
 
 audio_fx = AudioEffects()
 
+# Upload-Limit ohne Guild-Kontext (z.B. DMs)
+UPLOAD_LIMIT = 10 * 1024 * 1024
+# Länge der Vorschau im Vorschaumodus (Sekunden Eingangsmaterial)
+PREVIEW_SECONDS = 15
+# Im Vorschaumodus zuerst dekodierter Anfang; längere Eingaben werden erst nach der Vorschau vollständig dekodiert
+PREVIEW_DECODE_SECONDS = 2 * PREVIEW_SECONDS + 1
+# Maximale Anzahl Dateien je Nachricht (Discord-Limit)
+MAX_FILES_PER_MESSAGE = 10
+# Maximale Länge einer Discord-Nachricht und eines einzelnen Fehlereintrags
+MESSAGE_LIMIT = 2000
+MAX_ERROR_LENGTH = 200
+OutputFormat = Literal['wav', 'flac', 'opus', 'mp3']
+
 class AudioCog(commands.Cog):
     """
-    Cog mit Audio-Bearbeitungsbefehlen: slowed, slowed_reverb, reverb, stereo, mono.
+    Cog mit Audio-Bearbeitungsbefehlen: slowed, slowed_reverb, reverb, stereo, mono, fx, fx_batch, audio_cache.
     """
     def __init__(self, bot: commands.Bot):
         """
@@ -19,161 +35,702 @@ class AudioCog(commands.Cog):
         :return: None
         """
         self.bot = bot
+        self.render_tasks = set()
+
+    async def cog_unload(self):
+        """
+        Bricht laufende Hintergrund-Renderings ab und beendet den Audio-Prozesspool beim Entladen.
+
+        :return: None
+        """
+        for task in self.render_tasks:
+            task.cancel()
+        audio_pool.shutdown()
+
+    @staticmethod
+    def upload_limit(ctx: commands.Context) -> int:
+        """
+        Liefert das Upload-Limit des Kontexts.
+
+        :param ctx: Command-Kontext.
+        :return: Maximale Dateigröße in Bytes.
+        """
+        return ctx.guild.filesize_limit if ctx.guild else UPLOAD_LIMIT
+
+    async def send_cached(self, ctx: commands.Context, key: str, name: str) -> bool:
+        """
+        Sendet ein Ergebnis aus dem Ergebnis-Cache, falls vorhanden.
+
+        :param ctx: Command-Kontext.
+        :param key: Cache-Schlüssel.
+        :param name: Dateiname ohne Endung.
+        :return: True, falls aus dem Cache gesendet wurde.
+        """
+        cached = await asyncio.to_thread(result_cache.get, key, self.upload_limit(ctx))
+        if cached is None:
+            return False
+        encoded, fmt = cached
+        # Audioformate über ihre Dateiendung, Videos (Remux) direkt mit ihrer Endung
+        filename = f'{name}.{OUTPUT_FORMATS[fmt][0] if fmt in OUTPUT_FORMATS else fmt}'
+        await ctx.send('Ergebnis aus dem Cache.', file=discord.File(io.BytesIO(encoded), filename=filename))
+        return True
+
+    async def encode_audio(self, ctx: commands.Context, data, rate: int, name: str,
+                           output_format: str = 'wav', bitrate: int = 192, cache_key: str | None = None,
+                           video: AudioUpload | None = None,
+                           video_scale: float = 1.0) -> tuple[bytes, str, str | None]:
+        """
+        Kodiert das Ergebnis im Prozesspool; ist es zu groß, wird ein kleineres Format gewählt.
+
+        :param ctx: Command-Kontext.
+        :param data: Normalisierte Audiodaten.
+        :param rate: Abtastrate.
+        :param name: Dateiname ohne Endung.
+        :param output_format: Gewünschtes Ausgabeformat.
+        :param bitrate: Bitrate in kbit/s (Opus/MP3).
+        :param cache_key: Schlüssel, unter dem das Ergebnis im Ergebnis-Cache abgelegt wird.
+        :param video: Originalvideo, auf dessen Videospur das Audio gelegt wird (None = nur Audio).
+        :param video_scale: Zeitstreckung der Videospur passend zum Audio (z.B. 1/slow_factor).
+        :return: Tuple(kodierte Datei, Dateiname, Hinweis auf Ausweichformat oder None).
+        """
+        limit = self.upload_limit(ctx)
+        note = None
+        if video is not None:
+            try:
+                encoded, ext = await audio_pool.run(AudioEncoder.remux_video, video.ensure_file(), data, rate,
+                                                    bitrate, video_scale)
+            except Exception as e:
+                note = f'Remux fehlgeschlagen ({e}), nur Audio gesendet.'
+            else:
+                if len(encoded) <= limit:
+                    if cache_key is not None:
+                        await asyncio.to_thread(result_cache.put, cache_key, encoded, ext)
+                    return encoded, f'{name}.{ext}', None
+                note = 'Video zu groß, nur Audio gesendet.'
+        encoded, used = await audio_pool.run(AudioEncoder.encode_within_limit, data, rate,
+                                             output_format, bitrate, limit)
+        if cache_key is not None:
+            await asyncio.to_thread(result_cache.put, cache_key, encoded, used)
+        if used != output_format:
+            note = '\n'.join(t for t in (note, f'Ausgabe als {output_format} zu groß, gesendet als {used}.') if t)
+        return encoded, f'{name}.{OUTPUT_FORMATS[used][0]}', note
+
+    async def send_audio(self, ctx: commands.Context, data, rate: int, name: str,
+                         output_format: str = 'wav', bitrate: int = 192, content: str | None = None,
+                         cache_key: str | None = None, video: AudioUpload | None = None,
+                         video_scale: float = 1.0) -> discord.Message | None:
+        """
+        Kodiert das Ergebnis und sendet es.
+
+        :param ctx: Command-Kontext.
+        :param data: Normalisierte Audiodaten.
+        :param rate: Abtastrate.
+        :param name: Dateiname ohne Endung.
+        :param output_format: Gewünschtes Ausgabeformat.
+        :param bitrate: Bitrate in kbit/s (Opus/MP3).
+        :param content: Optionaler Nachrichtentext.
+        :param cache_key: Schlüssel, unter dem das Ergebnis im Ergebnis-Cache abgelegt wird.
+        :param video: Originalvideo für den Remux (None = nur Audio).
+        :param video_scale: Zeitstreckung der Videospur passend zum Audio.
+        :return: Gesendete Nachricht oder None bei Fehler.
+        """
+        try:
+            encoded, filename, note = await self.encode_audio(ctx, data, rate, name, output_format, bitrate,
+                                                              cache_key, video, video_scale)
+        except Exception as e:
+            await ctx.send(f'Fehler Ausgabedatei: {e}')
+            return None
+        text = '\n'.join(t for t in (content, note) if t) or None
+        return await ctx.send(text, file=discord.File(io.BytesIO(encoded), filename=filename))
+
+    async def render_and_send(self, ctx: commands.Context, render, data, rate: int, name: str,
+                              output_format: str, bitrate: int, error_text: str, content: str | None = None,
+                              cache_key: str | None = None, preview: bool = False,
+                              video: AudioUpload | None = None, video_scale: float = 1.0,
+                              upload: AudioUpload | None = None):
+        """
+        Rendert und sendet das Ergebnis. Im Vorschaumodus wird zuerst nur der Anfang gerendert und
+        gesendet; die vollständige Version ersetzt die Vorschau im Hintergrund.
+
+        :param ctx: Command-Kontext.
+        :param render: Async-Funktion, die Audiodaten rendert (z.B. über den Prozesspool).
+        :param data: Dekodierte Eingangsdaten (im Vorschaumodus ggf. nur die ersten PREVIEW_DECODE_SECONDS).
+        :param rate: Abtastrate.
+        :param name: Dateiname ohne Endung.
+        :param output_format: Gewünschtes Ausgabeformat.
+        :param bitrate: Bitrate in kbit/s (Opus/MP3).
+        :param error_text: Präfix der Fehlermeldung beim Rendern.
+        :param content: Optionaler Nachrichtentext.
+        :param cache_key: Schlüssel für den Ergebnis-Cache.
+        :param preview: Vorschau der ersten PREVIEW_SECONDS Sekunden vorab senden.
+        :param video: Originalvideo für den Remux der vollständigen Version (None = nur Audio).
+        :param video_scale: Zeitstreckung der Videospur passend zum Audio.
+        :param upload: Upload für die vollständige Dekodierung, falls data nur den Anfang enthält.
+        :return: None
+        """
+        preview_len = int(PREVIEW_SECONDS * rate)
+        # kürzer als zwei Vorschauen: data ist bereits die ganze Datei, eine Vorschau lohnt nicht
+        if not preview or len(data) <= 2 * preview_len:
+            try:
+                out = await render(data)
+            except Exception as e:
+                return await ctx.send(f'{error_text}: {e}')
+            await self.send_audio(ctx, out, rate, name, output_format, bitrate, content, cache_key, video,
+                                  video_scale)
+            return
+        # Vorschau: nur der Anfang (View, keine Kopie) über denselben blockweisen Pfad
+        try:
+            out = await render(data[:preview_len])
+        except Exception as e:
+            return await ctx.send(f'{error_text}: {e}')
+        note = f'Vorschau (erste {PREVIEW_SECONDS} s), die vollständige Version wird gerendert …'
+        message = await self.send_audio(ctx, out, rate, f'{name}_preview', output_format, bitrate,
+                                        '\n'.join(t for t in (content, note) if t))
+        if message is None:
+            return
+        if upload is not None:
+            # Anfang freigeben, die vollständige Version dekodiert den Upload neu
+            data = None
+        task = asyncio.create_task(self.finish_render(ctx, message, render, data, rate, name, output_format,
+                                                      bitrate, error_text, content, cache_key, video,
+                                                      video_scale, upload))
+        self.render_tasks.add(task)
+        task.add_done_callback(self.render_tasks.discard)
+
+    async def finish_render(self, ctx: commands.Context, message: discord.Message, render, data, rate: int,
+                            name: str, output_format: str, bitrate: int, error_text: str,
+                            content: str | None, cache_key: str | None, video: AudioUpload | None = None,
+                            video_scale: float = 1.0, upload: AudioUpload | None = None):
+        """
+        Rendert die vollständige Version im Hintergrund und ersetzt damit die Vorschau.
+
+        :param ctx: Command-Kontext.
+        :param message: Nachricht mit der Vorschau.
+        :param render: Async-Funktion, die Audiodaten rendert.
+        :param data: Dekodierte Eingangsdaten (None = aus upload dekodieren).
+        :param rate: Abtastrate.
+        :param name: Dateiname ohne Endung.
+        :param output_format: Gewünschtes Ausgabeformat.
+        :param bitrate: Bitrate in kbit/s (Opus/MP3).
+        :param error_text: Präfix der Fehlermeldung beim Rendern.
+        :param content: Optionaler Nachrichtentext.
+        :param cache_key: Schlüssel für den Ergebnis-Cache.
+        :param video: Originalvideo für den Remux (None = nur Audio).
+        :param video_scale: Zeitstreckung der Videospur passend zum Audio.
+        :param upload: Upload, der hier erst vollständig dekodiert wird.
+        :return: None
+        """
+        try:
+            if data is None:
+                rate, data = await asyncio.to_thread(upload.load)
+            out = await render(data)
+            encoded, filename, note = await self.encode_audio(ctx, out, rate, name, output_format, bitrate,
+                                                              cache_key, video, video_scale)
+        except Exception as e:
+            text = f'{error_text} (vollständige Version): {e}'
+            try:
+                await message.edit(content=text)
+            except discord.HTTPException:
+                await ctx.channel.send(text)
+            return
+        text = '\n'.join(t for t in (content, note) if t) or None
+        try:
+            await message.edit(content=text, attachments=[discord.File(io.BytesIO(encoded), filename=filename)])
+        except discord.HTTPException:
+            # Interaktion abgelaufen o.ä.: als neue Nachricht nachreichen
+            await ctx.channel.send(text, file=discord.File(io.BytesIO(encoded), filename=filename))
+
+    @staticmethod
+    def shorten(text: str, limit: int) -> str:
+        """
+        Kürzt einen Text auf eine Maximallänge.
+
+        :param text: Text.
+        :param limit: Maximale Anzahl Zeichen.
+        :return: Text, ggf. mit '…' gekürzt.
+        """
+        return text if len(text) <= limit else text[:limit - 1] + '…'
+
+    async def send_files(self, ctx: commands.Context, files: list[tuple[str, bytes]], content: str | None = None):
+        """
+        Sendet mehrere Dateien, aufgeteilt auf Nachrichten innerhalb von Datei- und Größenlimit.
+
+        :param ctx: Command-Kontext.
+        :param files: Liste aus (Dateiname, Inhalt).
+        :param content: Text der ersten Nachricht.
+        :return: None
+        """
+        limit = self.upload_limit(ctx)
+        group, size = [], 0
+        for filename, data in files:
+            if group and (len(group) == MAX_FILES_PER_MESSAGE or size + len(data) > limit):
+                await ctx.send(content, files=[discord.File(io.BytesIO(d), filename=n) for n, d in group])
+                content, group, size = None, [], 0
+            group.append((filename, data))
+            size += len(data)
+        if group:
+            await ctx.send(content, files=[discord.File(io.BytesIO(d), filename=n) for n, d in group])
+
+    @staticmethod
+    def zip_files(files: list[tuple[str, bytes]]) -> bytes:
+        """
+        Packt Dateien in ein ZIP-Archiv (ohne Kompression, Audio ist meist bereits komprimiert).
+
+        :param files: Liste aus (Dateiname, Inhalt).
+        :return: ZIP-Archiv als Bytes.
+        """
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:
+            for filename, data in files:
+                zf.writestr(filename, data)
+        return buf.getvalue()
+
+    @staticmethod
+    def ir_cache_info(cache_hit: bool, h, original_length: int, rate: int) -> str:
+        """
+        Beschreibt die Nutzung des IR-Caches und die Kürzung der Impulsantwort für eine Antwort.
+
+        :param cache_hit: Ob die Impulsantwort aus dem Cache kam.
+        :param h: Verwendete (gekürzte) Impulsantwort.
+        :param original_length: Ungekürzte IR-Länge in Samples.
+        :param rate: Abtastrate.
+        :return: Infotext.
+        """
+        stats = ir_cache.stats()
+        state = 'Treffer' if cache_hit else 'neu berechnet'
+        text = f'IR-Cache: {state} (Treffer: {stats["hits"]}, Fehlversuche: {stats["misses"]})'
+        if len(h) < original_length:
+            # Faltungsaufwand wächst mit der Anzahl der IR-Partitionen
+            saved = 1 - -(-len(h) // BLOCK_SIZE) / -(-original_length // BLOCK_SIZE)
+            text += (f'\nIR gekürzt: {len(h) / rate:.2f} s statt {original_length / rate:.2f} s '
+                     f'(Faltungsaufwand −{saved:.0%})')
+        return text
 
     @commands.hybrid_command(name='slowed', description='Verlangsamt Audio auf slow_factor.')
-    async def slowed(self, ctx: commands.Context, input_audio: discord.Attachment, slow_factor: float = 0.85):
+    async def slowed(self, ctx: commands.Context, input_audio: discord.Attachment, slow_factor: float = 0.85,
+                     quality: Literal['fast', 'balanced', 'high'] = 'balanced',
+                     output_format: OutputFormat = 'wav', bitrate: int = 192, preview: bool = False,
+                     keep_video: bool = False):
         """
         Verlangsamt das Audio um slow_factor.
 
         :param ctx: Command-Kontext.
         :param input_audio: Audio-Attachment.
         :param slow_factor: Verlangsamungsfaktor.
+        :param quality: Resampling-Qualität (Geschwindigkeit vs. Qualität).
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
+        :param preview: Vorschau vorab senden, vollständige Version folgt.
+        :param keep_video: Bei Videos das Ergebnis auf die Originalvideospur legen (ohne Neukodierung).
         :return: None
         """
         await ctx.defer()
         try:
-            rate, data = await audio_fx.load_audio_from_attachment(input_audio)
+            upload = await AudioUpload.fetch(input_audio)
         except Exception as e:
             return await ctx.send(f'Fehler: {e}')
-        out = audio_fx.slow_audio(data, slow_factor)
-        arr = np.int16(out * 32767)
-        buf = io.BytesIO()
+        params = {'slow_factor': slow_factor, 'quality': quality, 'format': output_format, 'bitrate': bitrate}
+        video = upload if keep_video and upload.is_video else None
+        if video is not None:
+            params['keep_video'] = True
+        key = result_cache.make_key('slowed', params, upload)
+        if await self.send_cached(ctx, key, 'slowed_result'):
+            return
         try:
-            wavfile.write(buf, rate, arr)
+            rate, data = await asyncio.to_thread(upload.load, PREVIEW_DECODE_SECONDS if preview else None)
         except Exception as e:
-            return await ctx.send(f'Fehler Erzeugen Ausgabedatei: {e}')
-        buf.seek(0)
-        await ctx.send(file=discord.File(buf, filename='slowed_result.wav'))
+            return await ctx.send(f'Fehler: {e}')
+
+        async def render(d):
+            return await audio_pool.run(AudioEffects.slow_audio, d, slow_factor, quality=quality)
+
+        await self.render_and_send(ctx, render, data, rate, 'slowed_result', output_format, bitrate,
+                                   'Fehler Verlangsamung', cache_key=key, preview=preview, video=video,
+                                   video_scale=1 / slow_factor, upload=upload)
 
     @commands.hybrid_command(name='slowed_reverb', description='Slowed+Reverb: Verlangsame und fügen Halleffekt hinzu.')
-    async def slowed_reverb(self, ctx: commands.Context, input_audio: discord.Attachment, impulse_audio: discord.Attachment, slow_factor: float = 0.85):
+    async def slowed_reverb(self, ctx: commands.Context, input_audio: discord.Attachment,
+                            impulse_audio: Optional[discord.Attachment] = None, slow_factor: float = 0.85,
+                            quality: Literal['fast', 'balanced', 'high'] = 'balanced',
+                            room_size: float = 0.7, decay: float = 2.5, damping: float = 0.4,
+                            output_format: OutputFormat = 'wav', bitrate: int = 192, preview: bool = False,
+                            keep_video: bool = False):
         """
-        Kombiniert Verlangsamung und Reverb per Impulsantwort.
+        Kombiniert Verlangsamung und Reverb per Impulsantwort oder, ohne Impulsantwort, algorithmischem Hall.
 
         :param ctx: Command-Kontext.
         :param input_audio: Original-Audio.
-        :param impulse_audio: Impulsantwort.
+        :param impulse_audio: Impulsantwort (optional).
         :param slow_factor: Verlangsamungsfaktor.
+        :param quality: Resampling-Qualität (Geschwindigkeit vs. Qualität).
+        :param room_size: Raumgröße des algorithmischen Halls (0.1 bis 2).
+        :param decay: Nachhallzeit des algorithmischen Halls in Sekunden.
+        :param damping: Höhendämpfung des algorithmischen Halls (0 bis 0.99).
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
+        :param preview: Vorschau vorab senden, vollständige Version folgt.
+        :param keep_video: Bei Videos das Ergebnis auf die Originalvideospur legen (ohne Neukodierung).
         :return: None
         """
         await ctx.defer()
         try:
-            rate_x, x = await audio_fx.load_audio_from_attachment(input_audio)
-            rate_h, h = await audio_fx.load_audio_from_attachment(impulse_audio)
+            upload = await AudioUpload.fetch(input_audio)
+            ir_bytes = await impulse_audio.read() if impulse_audio is not None else None
         except Exception as e:
             return await ctx.send(f'Fehler Einlesen: {e}')
-        if rate_x != rate_h:
-            try:
-                h = audio_fx.refined_resample_audio(h, rate_h, rate_x)
-                rate_h = rate_x
-            except Exception as e:
-                return await ctx.send(f'Fehler Resampling: {e}')
+        params = {'slow_factor': slow_factor, 'quality': quality, 'format': output_format, 'bitrate': bitrate}
+        if ir_bytes is None:
+            params.update(room_size=room_size, decay=decay, damping=damping)
+        video = upload if keep_video and upload.is_video else None
+        if video is not None:
+            params['keep_video'] = True
+        key = result_cache.make_key('slowed_reverb', params, upload, *([ir_bytes] if ir_bytes is not None else []))
+        if await self.send_cached(ctx, key, 'slowed_reverb_result'):
+            return
         try:
-            y = audio_fx.refined_convolve_audio(x, h)
+            rate_x, x = await asyncio.to_thread(upload.load, PREVIEW_DECODE_SECONDS if preview else None)
         except Exception as e:
-            return await ctx.send(f'Fehler Faltung: {e}')
-        out = audio_fx.slow_audio(y, slow_factor)
-        arr = np.int16(out * 32767)
-        buf = io.BytesIO()
-        try:
-            wavfile.write(buf, rate_x, arr)
-        except Exception as e:
-            return await ctx.send(f'Fehler Ausgabedatei: {e}')
-        buf.seek(0)
-        await ctx.send(file=discord.File(buf, filename='slowed_reverb_result.wav'))
+            return await ctx.send(f'Fehler Einlesen: {e}')
+        if ir_bytes is None:
+            # algorithmischer Hall: keine Impulsantwort laden, keine Faltung
+            h = spectra = None
+            chain = EffectChain([('room', decay), ('slow', slow_factor)])
+            content = f'Algorithmischer Hall (Raum {room_size:g}, {decay:g} s, Dämpfung {damping:g})'
+        else:
+            try:
+                h, spectra, cache_hit, ir_length = await asyncio.to_thread(
+                    audio_fx.load_impulse_response, ir_bytes, impulse_audio.filename, rate_x)
+            except Exception as e:
+                return await ctx.send(f'Fehler Impulsantwort: {e}')
+            chain = EffectChain([('reverb', None), ('slow', slow_factor)])
+            content = self.ir_cache_info(cache_hit, h, ir_length, rate_x)
+
+        # Hall und Verlangsamung in einem Durchgang, eine gemeinsame Normalisierung
+        async def render(d):
+            return await audio_pool.run(chain.run, d, rate_x, h=h, spectra=spectra, quality=quality,
+                                        room_size=room_size, damping=damping)
+
+        await self.render_and_send(ctx, render, x, rate_x, 'slowed_reverb_result', output_format, bitrate,
+                                   'Fehler Hall', content, key, preview, video, chain.time_scale, upload)
 
-    @commands.hybrid_command(name='reverb', description='Faltet Audio mit einer Impulsantwort.')
-    async def reverb(self, ctx: commands.Context, input_audio: discord.Attachment, impulse_audio: discord.Attachment):
+    @commands.hybrid_command(name='reverb', description='Fügt Halleffekt hinzu (Impulsantwort oder algorithmisch).')
+    async def reverb(self, ctx: commands.Context, input_audio: discord.Attachment,
+                     impulse_audio: Optional[discord.Attachment] = None,
+                     room_size: float = 0.7, decay: float = 2.5, damping: float = 0.4,
+                     output_format: OutputFormat = 'wav', bitrate: int = 192, preview: bool = False,
+                     keep_video: bool = False):
         """
-        Fügt Halleffekt durch Faltung hinzu.
+        Fügt Halleffekt durch Faltung hinzu; ohne Impulsantwort wird algorithmischer Hall verwendet.
 
         :param ctx: Command-Kontext.
         :param input_audio: Original-Audio.
-        :param impulse_audio: Impulsantwort.
+        :param impulse_audio: Impulsantwort (optional).
+        :param room_size: Raumgröße des algorithmischen Halls (0.1 bis 2).
+        :param decay: Nachhallzeit des algorithmischen Halls in Sekunden.
+        :param damping: Höhendämpfung des algorithmischen Halls (0 bis 0.99).
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
+        :param preview: Vorschau vorab senden, vollständige Version folgt.
+        :param keep_video: Bei Videos das Ergebnis auf die Originalvideospur legen (ohne Neukodierung).
         :return: None
         """
         await ctx.defer()
         try:
-            rate_x, x = await audio_fx.load_audio_from_attachment(input_audio)
-            rate_h, h = await audio_fx.load_audio_from_attachment(impulse_audio)
+            upload = await AudioUpload.fetch(input_audio)
+            ir_bytes = await impulse_audio.read() if impulse_audio is not None else None
         except Exception as e:
             return await ctx.send(f'Fehler Einlesen: {e}')
-        if rate_x != rate_h:
-            try:
-                h = audio_fx.refined_resample_audio(h, rate_h, rate_x)
-                rate_h = rate_x
-            except Exception as e:
-                return await ctx.send(f'Fehler Resampling: {e}')
+        params = {'format': output_format, 'bitrate': bitrate}
+        if ir_bytes is None:
+            params.update(room_size=room_size, decay=decay, damping=damping)
+        video = upload if keep_video and upload.is_video else None
+        if video is not None:
+            params['keep_video'] = True
+        key = result_cache.make_key('reverb', params, upload, *([ir_bytes] if ir_bytes is not None else []))
+        if await self.send_cached(ctx, key, 'reverb_result'):
+            return
         try:
-            y = audio_fx.refined_convolve_audio(x, h)
+            rate_x, x = await asyncio.to_thread(upload.load, PREVIEW_DECODE_SECONDS if preview else None)
         except Exception as e:
-            return await ctx.send(f'Fehler Faltung: {e}')
-        arr = np.int16(y * 32767)
-        buf = io.BytesIO()
-        try:
-            wavfile.write(buf, rate_x, arr)
-        except Exception as e:
-            return await ctx.send(f'Fehler Ausgabedatei: {e}')
-        buf.seek(0)
-        await ctx.send(file=discord.File(buf, filename='reverb_result.wav'))
+            return await ctx.send(f'Fehler Einlesen: {e}')
+        if ir_bytes is None:
+            content = f'Algorithmischer Hall (Raum {room_size:g}, {decay:g} s, Dämpfung {damping:g})'
+
+            async def render(d):
+                return await audio_pool.run(AudioEffects.algorithmic_reverb, d, rate_x, room_size, decay, damping)
+        else:
+            try:
+                h, spectra, cache_hit, ir_length = await asyncio.to_thread(
+                    audio_fx.load_impulse_response, ir_bytes, impulse_audio.filename, rate_x)
+            except Exception as e:
+                return await ctx.send(f'Fehler Impulsantwort: {e}')
+            content = self.ir_cache_info(cache_hit, h, ir_length, rate_x)
+
+            async def render(d):
+                return await audio_pool.run(AudioEffects.refined_convolve_audio, d, h, spectra=spectra)
+
+        await self.render_and_send(ctx, render, x, rate_x, 'reverb_result', output_format, bitrate,
+                                   'Fehler Hall', content, key, preview, video, upload=upload)
 
     @commands.hybrid_command(name='stereo', description='Wandelt Mono zu Stereo um.')
-    async def stereo(self, ctx: commands.Context, input_audio: discord.Attachment):
+    async def stereo(self, ctx: commands.Context, input_audio: discord.Attachment,
+                     output_format: OutputFormat = 'wav', bitrate: int = 192):
         """
         Erzeugt Stereo aus Mono mittels Haas-Effekt.
 
         :param ctx: Command-Kontext.
         :param input_audio: Mono-Audio.
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
         :return: None
         """
         await ctx.defer()
         try:
-            rate, data = await audio_fx.load_audio_from_attachment(input_audio)
+            upload = await AudioUpload.fetch(input_audio)
+        except Exception as e:
+            return await ctx.send(f'Fehler Laden: {e}')
+        key = result_cache.make_key('stereo', {'format': output_format, 'bitrate': bitrate}, upload)
+        if await self.send_cached(ctx, key, 'stereo_result'):
+            return
+        try:
+            rate, data = await asyncio.to_thread(upload.load)
         except Exception as e:
             return await ctx.send(f'Fehler Laden: {e}')
         if data.ndim != 1:
             return await ctx.send('Fehler: Kein Mono-Signal')
         try:
-            out = audio_fx.mono_to_stereo(data, rate)
+            out = await audio_pool.run(AudioEffects.mono_to_stereo, data, rate)
         except Exception as e:
             return await ctx.send(f'Fehler Umwandlung: {e}')
-        arr = np.int16(out * 32767)
-        buf = io.BytesIO()
-        try:
-            wavfile.write(buf, rate, arr)
-        except Exception as e:
-            return await ctx.send(f'Fehler Ausgabedatei: {e}')
-        buf.seek(0)
-        await ctx.send(file=discord.File(buf, filename='stereo_result.wav'))
+        await self.send_audio(ctx, out, rate, 'stereo_result', output_format, bitrate, cache_key=key)
 
     @commands.hybrid_command(name='mono', description='Wandelt Stereo zu Mono um.')
-    async def mono(self, ctx: commands.Context, input_audio: discord.Attachment):
+    async def mono(self, ctx: commands.Context, input_audio: discord.Attachment,
+                   output_format: OutputFormat = 'wav', bitrate: int = 192):
         """
-        Wandelt Stereo zu Mono durch Mittelung beider Kanäle.
+        Wandelt Stereo (oder Mehrkanal) zu Mono durch Mittelung aller Kanäle.
 
         :param ctx: Command-Kontext.
-        :param input_audio: Stereo-Audio.
+        :param input_audio: Stereo-/Mehrkanal-Audio.
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
         :return: None
         """
         await ctx.defer()
         try:
-            rate, data = await audio_fx.load_audio_from_attachment(input_audio)
+            upload = await AudioUpload.fetch(input_audio)
+        except Exception as e:
+            return await ctx.send(f'Fehler Laden: {e}')
+        key = result_cache.make_key('mono', {'format': output_format, 'bitrate': bitrate}, upload)
+        if await self.send_cached(ctx, key, 'mono_result'):
+            return
+        try:
+            rate, data = await asyncio.to_thread(upload.load)
         except Exception as e:
             return await ctx.send(f'Fehler Laden: {e}')
-        if data.ndim != 2 or data.shape[1] != 2:
+        if data.ndim != 2 or data.shape[1] < 2:
             return await ctx.send('Fehler: Kein Stereo-Signal')
         try:
-            out = audio_fx.stereo_to_mono(data)
+            out = await audio_pool.run(AudioEffects.stereo_to_mono, data)
         except Exception as e:
             return await ctx.send(f'Fehler Umwandlung: {e}')
-        arr = np.int16(out * 32767)
-        buf = io.BytesIO()
+        await self.send_audio(ctx, out, rate, 'mono_result', output_format, bitrate, cache_key=key)
+
+    @commands.hybrid_command(name='fx', description='Effektkette in einem Durchgang, z.B. slow:0.8|reverb|stereo.')
+    async def fx(self, ctx: commands.Context, input_audio: discord.Attachment, chain: str,
+                 impulse_audio: Optional[discord.Attachment] = None,
+                 quality: Literal['fast', 'balanced', 'high'] = 'balanced',
+                 output_format: OutputFormat = 'wav', bitrate: int = 192, preview: bool = False,
+                 keep_video: bool = False):
+        """
+        Wendet eine Effektkette (slow, reverb, room, stereo, mono) in einem Durchgang an.
+
+        :param ctx: Command-Kontext.
+        :param input_audio: Original-Audio.
+        :param chain: Effektkette, Stufen durch | getrennt, z.B. slow:0.8|reverb|stereo.
+        :param impulse_audio: Impulsantwort für reverb-Stufen.
+        :param quality: Resampling-Qualität (Geschwindigkeit vs. Qualität).
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
+        :param preview: Vorschau vorab senden, vollständige Version folgt.
+        :param keep_video: Bei Videos das Ergebnis auf die Originalvideospur legen (ohne Neukodierung).
+        :return: None
+        """
+        await ctx.defer()
+        try:
+            effects = EffectChain.parse(chain)
+        except ValueError as e:
+            return await ctx.send(f'Fehler Effektkette: {e}')
+        if effects.needs_impulse and impulse_audio is None:
+            return await ctx.send('Fehler: reverb benötigt impulse_audio')
+        try:
+            upload = await AudioUpload.fetch(input_audio)
+            ir_bytes = await impulse_audio.read() if effects.needs_impulse else None
+        except Exception as e:
+            return await ctx.send(f'Fehler Einlesen: {e}')
+        params = {'chain': effects.describe(), 'quality': quality, 'format': output_format, 'bitrate': bitrate}
+        video = upload if keep_video and upload.is_video else None
+        if video is not None:
+            params['keep_video'] = True
+        key = result_cache.make_key('fx', params, upload, *([ir_bytes] if ir_bytes is not None else []))
+        if await self.send_cached(ctx, key, 'fx_result'):
+            return
         try:
-            wavfile.write(buf, rate, arr)
+            rate, data = await asyncio.to_thread(upload.load, PREVIEW_DECODE_SECONDS if preview else None)
         except Exception as e:
-            return await ctx.send(f'Fehler Ausgabedatei: {e}')
-        buf.seek(0)
-        await ctx.send(file=discord.File(buf, filename='mono_result.wav'))
+            return await ctx.send(f'Fehler Einlesen: {e}')
+        h = spectra = None
+        content = f'Kette: {effects.describe()}'
+        if ir_bytes is not None:
+            try:
+                h, spectra, cache_hit, ir_length = await asyncio.to_thread(
+                    audio_fx.load_impulse_response, ir_bytes, impulse_audio.filename, rate)
+            except Exception as e:
+                return await ctx.send(f'Fehler Impulsantwort: {e}')
+            content += f'\n{self.ir_cache_info(cache_hit, h, ir_length, rate)}'
+
+        async def render(d):
+            return await audio_pool.run(effects.run, d, rate, h=h, spectra=spectra, quality=quality)
+
+        await self.render_and_send(ctx, render, data, rate, 'fx_result', output_format, bitrate,
+                                   'Fehler Effektkette', content, key, preview, video, effects.time_scale,
+                                   upload)
+
+    @commands.hybrid_command(name='fx_batch', description='Wendet eine Effektkette auf mehrere Audiodateien an.')
+    async def fx_batch(self, ctx: commands.Context, chain: str, audio_1: discord.Attachment,
+                       audio_2: Optional[discord.Attachment] = None, audio_3: Optional[discord.Attachment] = None,
+                       audio_4: Optional[discord.Attachment] = None, audio_5: Optional[discord.Attachment] = None,
+                       audio_6: Optional[discord.Attachment] = None, audio_7: Optional[discord.Attachment] = None,
+                       audio_8: Optional[discord.Attachment] = None,
+                       impulse_audio: Optional[discord.Attachment] = None,
+                       quality: Literal['fast', 'balanced', 'high'] = 'balanced',
+                       output_format: OutputFormat = 'wav', bitrate: int = 192, as_zip: bool = True):
+        """
+        Wendet dieselbe Effektkette auf bis zu acht Dateien an. Die Impulsantwort wird nur einmal je
+        Abtastrate aufbereitet, die Dateien werden parallel im Prozesspool gerendert.
+
+        :param ctx: Command-Kontext.
+        :param chain: Effektkette, Stufen durch | getrennt, z.B. slow:0.8|reverb|stereo.
+        :param audio_1: Erste Audiodatei.
+        :param audio_2: Weitere Audiodatei.
+        :param audio_3: Weitere Audiodatei.
+        :param audio_4: Weitere Audiodatei.
+        :param audio_5: Weitere Audiodatei.
+        :param audio_6: Weitere Audiodatei.
+        :param audio_7: Weitere Audiodatei.
+        :param audio_8: Weitere Audiodatei.
+        :param impulse_audio: Impulsantwort für reverb-Stufen.
+        :param quality: Resampling-Qualität (Geschwindigkeit vs. Qualität).
+        :param output_format: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s für Opus/MP3.
+        :param as_zip: Ergebnisse als ein ZIP-Archiv senden (sonst Einzeldateien).
+        :return: None
+        """
+        await ctx.defer()
+        try:
+            effects = EffectChain.parse(chain)
+        except ValueError as e:
+            return await ctx.send(f'Fehler Effektkette: {e}')
+        if effects.needs_impulse and impulse_audio is None:
+            return await ctx.send('Fehler: reverb benötigt impulse_audio')
+        attachments = [a for a in (audio_1, audio_2, audio_3, audio_4, audio_5, audio_6, audio_7, audio_8)
+                       if a is not None]
+        try:
+            ir_bytes = await impulse_audio.read() if effects.needs_impulse else None
+        except Exception as e:
+            return await ctx.send(f'Fehler Einlesen: {e}')
+        # ein fehlgeschlagener Download bricht die übrigen Dateien nicht ab
+        uploads = await asyncio.gather(*(AudioUpload.fetch(a) for a in attachments), return_exceptions=True)
+        params = {'chain': effects.describe(), 'quality': quality, 'format': output_format, 'bitrate': bitrate}
+        limit = self.upload_limit(ctx)
+        keys = [None if isinstance(u, BaseException)
+                else result_cache.make_key('fx', params, u, *([ir_bytes] if ir_bytes is not None else []))
+                for u in uploads]
+        cached = await asyncio.gather(*(asyncio.to_thread(result_cache.get, k, limit) for k in keys
+                                        if k is not None))
+        cached = iter(cached)
+        cached = [u if isinstance(u, BaseException) else next(cached) for u in uploads]
+        # nicht gecachte Dateien parallel dekodieren
+        todo = [i for i, c in enumerate(cached) if c is None]
+        decoded = await asyncio.gather(*(asyncio.to_thread(uploads[i].load) for i in todo),
+                                       return_exceptions=True)
+        # Impulsantwort einmal je vorkommender Abtastrate aufbereiten
+        impulses = {}
+        if ir_bytes is not None:
+            for rate in {d[0] for d in decoded if not isinstance(d, BaseException)}:
+                try:
+                    h, spectra, _, _ = await asyncio.to_thread(
+                        audio_fx.load_impulse_response, ir_bytes, impulse_audio.filename, rate)
+                except Exception as e:
+                    return await ctx.send(f'Fehler Impulsantwort: {e}')
+                impulses[rate] = (h, spectra)
+
+        async def process(key, item):
+            if isinstance(item, BaseException):
+                raise item
+            rate, data = item
+            h, spectra = impulses.get(rate, (None, None))
+            out = await audio_pool.run(effects.run, data, rate, h=h, spectra=spectra, quality=quality)
+            encoded, used = await audio_pool.run(AudioEncoder.encode_within_limit, out, rate,
+                                                 output_format, bitrate, limit)
+            await asyncio.to_thread(result_cache.put, key, encoded, used)
+            return encoded, used
+
+        # Rendern und Kodieren aller Dateien gleichzeitig über den Prozesspool
+        rendered = await asyncio.gather(*(process(keys[i], d) for i, d in zip(todo, decoded)),
+                                        return_exceptions=True)
+        results = list(cached)
+        for i, r in zip(todo, rendered):
+            results[i] = r
+
+        files, errors, names = [], [], set()
+        for attachment, result in zip(attachments, results):
+            if isinstance(result, BaseException):
+                # mehrzeilige Fehlerausgaben (z.B. ffmpeg) auf eine kurze Zeile reduzieren
+                errors.append(self.shorten(' '.join(f'{attachment.filename}: {result}'.split()), MAX_ERROR_LENGTH))
+                continue
+            encoded, used = result
+            stem = os.path.splitext(attachment.filename)[0]
+            filename = f'{stem}_fx.{OUTPUT_FORMATS[used][0]}'
+            n = 2
+            while filename in names:
+                filename = f'{stem}_fx_{n}.{OUTPUT_FORMATS[used][0]}'
+                n += 1
+            names.add(filename)
+            files.append((filename, encoded))
+        from_cache = sum(1 for c in cached if c is not None and not isinstance(c, BaseException))
+        content = f'Kette: {effects.describe()} – {len(files)}/{len(attachments)} Dateien'
+        if from_cache:
+            content += f', davon {from_cache} aus dem Cache'
+        if errors:
+            content += '\nFehler:\n' + '\n'.join(errors)
+        # Platz für den ZIP-Hinweis lassen
+        content = self.shorten(content, MESSAGE_LIMIT - 100)
+        if not files:
+            return await ctx.send(content)
+        if as_zip:
+            archive = await asyncio.to_thread(self.zip_files, files)
+            if len(archive) <= limit:
+                return await ctx.send(content, file=discord.File(io.BytesIO(archive), filename='fx_batch.zip'))
+            content += '\nZIP zu groß, sende Einzeldateien.'
+        await self.send_files(ctx, files, content)
+
+    @commands.hybrid_command(name='audio_cache', description='Zeigt die Statistik der Audio-Caches.')
+    async def audio_cache(self, ctx: commands.Context):
+        """
+        Zeigt Trefferquote und eingesparte Bytes des Ergebnis-Caches sowie den IR-Cache.
+
+        :param ctx: Command-Kontext.
+        :return: None
+        """
+        stats = result_cache.stats()
+        ir_stats = ir_cache.stats()
+        await ctx.send(
+            f'Ergebnis-Cache: {stats["hits"]} Treffer, {stats["misses"]} Fehlversuche '
+            f'(Trefferquote {stats["hit_rate"]:.0%}), {stats["bytes_saved"] / 2 ** 20:.1f} MB eingespart, '
+            f'{stats["total_bytes"] / 2 ** 20:.1f} MB belegt\n'
+            f'IR-Cache: {ir_stats["hits"]} Treffer, {ir_stats["misses"]} Fehlversuche, {ir_stats["entries"]} Einträge'
+        )
 
 async def setup(bot: commands.Bot):
     """
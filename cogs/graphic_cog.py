@@ -1,15 +1,28 @@
 import io
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
 import discord
 import os
 import aiohttp
 from discord.ext import commands
 from typing import Literal
-from utils.graphic_utils import GraphicUtils
+from utils.graphic_utils import GraphicUtils, media_scheduler, IMAGE_QUALITY, PNG_COMPRESSION
+from utils.ffmpeg_utils import FFmpegError
 from openai import OpenAI
 
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
 graphic_utils = GraphicUtils()
+# Mindestabstand (s) zwischen zwei Fortschrittsmeldungen
+PROGRESS_INTERVAL = 5.0
+# Gültigkeit eines Interaction-Tokens und Reserve für das Senden des Ergebnisses
+INTERACTION_LIFETIME = timedelta(minutes=15)
+SEND_RESERVE = timedelta(seconds=60)
+# Upload-Limit außerhalb von Servern (Bytes)
+UPLOAD_LIMIT = 10 * 1024 * 1024
+# Unterstützte Bildendungen
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.bmp', '.jpeg', '.webp')
 
 class GraphicCog(commands.Cog):
     """
@@ -67,13 +80,102 @@ class GraphicCog(commands.Cog):
 
         await ctx.send(file=file, embed=embed)
 
+    @staticmethod
+    async def report_queue(ctx: commands.Context, position: int):
+        """
+        Meldet die Warteposition eines Video-Jobs.
+
+        :param ctx: Command-Kontext.
+        :param position: Position in der Warteschlange (ab 1).
+        :return: None
+        """
+        await ctx.send(f'Viele Video-Jobs gleichzeitig – du bist auf Position {position} in der Warteschlange.')
+
+    @staticmethod
+    def progress_reporter(ctx: commands.Context):
+        """
+        Erstellt einen Callback, der den ffmpeg-Fortschritt in einer Statusnachricht anzeigt.
+
+        :param ctx: Command-Kontext.
+        :return: Coroutine-Funktion für FFmpegRunner.run(on_progress=...).
+        """
+        state = {'message': None, 'last': time.monotonic()}
+
+        async def report(progress: dict):
+            now = time.monotonic()
+            if progress.get('progress') == 'end' or now - state['last'] < PROGRESS_INTERVAL:
+                return
+            state['last'] = now
+            seconds = int(progress.get('out_time_us', '0') or 0) / 1e6
+            text = f"Verarbeite Video… {seconds:.0f} s fertig ({progress.get('speed', '?').strip()})"
+            if state['message'] is None:
+                state['message'] = await ctx.send(text)
+            else:
+                await state['message'].edit(content=text)
+        return report
+
+    @staticmethod
+    def remaining_time(ctx: commands.Context) -> float | None:
+        """
+        Verbleibende Zeit, bis die Antwort auf die Interaction nicht mehr gesendet werden kann.
+
+        :param ctx: Command-Kontext.
+        :return: Sekunden bis zur Frist (abzüglich Sendereserve) oder None bei Prefix-Befehlen.
+        """
+        if ctx.interaction is None:
+            return None
+        deadline = ctx.interaction.created_at + INTERACTION_LIFETIME - SEND_RESERVE
+        return max(0.0, (deadline - datetime.now(timezone.utc)).total_seconds())
+
+    async def run_video_job(self, ctx: commands.Context, func, *args) -> bytes | None:
+        """
+        Führt einen Video-Job über den Scheduler aus; bei abgelaufener Interaction-Frist wird er abgebrochen.
+
+        :param ctx: Command-Kontext.
+        :param func: Coroutine-Funktion von GraphicUtils.
+        :param args: Argumente für func.
+        :return: Ergebnis als Bytes oder None, falls bereits eine Fehlermeldung gesendet wurde.
+        """
+        job = media_scheduler.run(func, *args, on_queued=lambda pos: self.report_queue(ctx, pos),
+                                  on_progress=self.progress_reporter(ctx))
+        try:
+            # Abbruch bei Fristablauf beendet auch Warteschlange und laufende ffmpeg-Prozesse
+            return await asyncio.wait_for(job, self.remaining_time(ctx))
+        except (asyncio.TimeoutError, TimeoutError) as e:
+            # asyncio.TimeoutError ist vor Python 3.11 eine eigene Klasse
+            await ctx.send(f'Verarbeitung abgebrochen: {str(e) or "Zeitlimit der Anfrage erreicht"}')
+        except FFmpegError as e:
+            detail = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else f'Rückgabecode {e.returncode}'
+            await ctx.send(f'Fehler bei der Videoverarbeitung: {detail[:300]}')
+        except ValueError as e:
+            await ctx.send(f'Fehler bei der Videoverarbeitung: {str(e)[:300]}')
+        except OSError as e:
+            # z.B. ffmpeg nicht installiert oder nicht ausführbar
+            await ctx.send(f'FFmpeg konnte nicht gestartet werden: {e.strerror or e}')
+        return None
+
+    @staticmethod
+    def upload_limit(ctx: commands.Context) -> int:
+        """
+        Liefert das Upload-Limit des Kontexts.
+
+        :param ctx: Command-Kontext.
+        :return: Maximale Dateigröße in Bytes.
+        """
+        return ctx.guild.filesize_limit if ctx.guild else UPLOAD_LIMIT
+
     @commands.hybrid_command(name='sw', description='Konvertiert Medien in Schwarz-Weiß')
-    async def sw(self, ctx: commands.Context, input_file: discord.Attachment):
+    async def sw(self, ctx: commands.Context, input_file: discord.Attachment,
+                 output_format: Literal['auto', 'png', 'jpeg', 'webp'] = 'auto', quality: int = IMAGE_QUALITY,
+                 compression: int = PNG_COMPRESSION):
         """
         Konvertiert Bild oder Video in Graustufen.
 
         :param ctx: Command-Kontext.
         :param input_file: Eingabedatei als Attachment.
+        :param output_format: Bild-Ausgabeformat ('auto' = wie die Eingabe).
+        :param quality: Bildqualität (1-100) für JPEG/WebP.
+        :param compression: PNG-Kompressionsstufe (0-9).
         :return: None
         """
         await ctx.defer()
@@ -82,11 +184,17 @@ class GraphicCog(commands.Cog):
         except Exception as e:
             return await ctx.send(f'Fehler beim Herunterladen: {e}')
         name = input_file.filename.lower()
-        if name.endswith(('.png', '.jpg', '.bmp', '.jpeg')):
-            result = graphic_utils.convert_to_grayscale_image(data)
-            out_name = 'sw_result.png'
+        if name.endswith(IMAGE_EXTENSIONS):
+            try:
+                result, ext = await asyncio.to_thread(graphic_utils.convert_to_grayscale_image, data, output_format,
+                                                      quality, compression, self.upload_limit(ctx))
+            except ValueError as e:
+                return await ctx.send(f'Fehler bei der Bildkonvertierung: {e}')
+            out_name = f'sw_result.{ext}'
         elif name.endswith(('.mp4', '.avi')):
-            result = graphic_utils.convert_to_grayscale_video(data)
+            result = await self.run_video_job(ctx, graphic_utils.convert_to_grayscale_video, data)
+            if result is None:
+                return
             out_name = 'sw_result.mp4'
         else:
             return await ctx.send('Ungültiges Dateiformat.')
@@ -97,7 +205,9 @@ class GraphicCog(commands.Cog):
     @commands.hybrid_command(name='watermark', description='Wasserzeichen auf Bild oder Video anwenden')
     async def watermark(self, ctx: commands.Context, input_file: discord.Attachment, watermark_file: discord.Attachment,
                         position: Literal['top-left','top-right','bottom-left','bottom-right','center']='center',
-                        scale: str='1.0', transparency: str='1.0'):
+                        scale: str='1.0', transparency: str='1.0',
+                        output_format: Literal['auto', 'png', 'jpeg', 'webp'] = 'auto', quality: int = IMAGE_QUALITY,
+                        compression: int = PNG_COMPRESSION):
         """
         Fügt Wasserzeichen zu Bild/Video hinzu.
 
@@ -107,6 +217,9 @@ class GraphicCog(commands.Cog):
         :param position: Position des Wasserzeichens.
         :param scale: Skalierung als String.
         :param transparency: Transparenz als String.
+        :param output_format: Bild-Ausgabeformat ('auto' = wie die Eingabe).
+        :param quality: Bildqualität (1-100) für JPEG/WebP.
+        :param compression: PNG-Kompressionsstufe (0-9).
         :return: None
         """
         await ctx.defer()
@@ -127,11 +240,17 @@ class GraphicCog(commands.Cog):
         except Exception:
             return await ctx.send('Ungültige Zahlenformate')
         name = input_file.filename.lower()
-        if name.endswith(('.png', '.jpg', '.bmp', '.jpeg')):
-            out = graphic_utils.watermark_image_file(data_in, data_wm, position, sc, tr)
-            out_name = 'watermark_result.png'
+        if name.endswith(IMAGE_EXTENSIONS):
+            try:
+                out, ext = await asyncio.to_thread(graphic_utils.watermark_image_file, data_in, data_wm, position, sc,
+                                                   tr, output_format, quality, compression, self.upload_limit(ctx))
+            except ValueError as e:
+                return await ctx.send(f'Fehler beim Wasserzeichen: {e}')
+            out_name = f'watermark_result.{ext}'
         elif name.endswith(('.mp4', '.mov')):
-            out = graphic_utils.watermark_video_file(data_in, data_wm, position, sc, tr)
+            out = await self.run_video_job(ctx, graphic_utils.watermark_video_file, data_in, data_wm, position, sc, tr)
+            if out is None:
+                return
             out_name = 'watermark_result.mp4'
         else:
             return await ctx.send('Ungültiges Dateiformat.')
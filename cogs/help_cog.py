@@ -40,19 +40,22 @@ class HelpCog(commands.Cog):
         embed.add_field(
             name="🟨 **Audio-Effekte**", inline=False,
             value=(
-                "**/slowed** `<input_audio>` [slow_factor] – Audio verlangsamen\n"
-                "**/slowed_reverb** `<input_audio>` `<impulse_audio>` [slow_factor] – Reverb + Slowed\n"
-                "**/reverb** `<input_audio>` `<impulse_audio>` – Nur Reverb\n"
-                "**/stereo** `<input_audio>` – Mono → Stereo (Haas-Effekt)\n"
-                "**/mono** `<input_audio>` – Stereo → Mono"
+                "**/slowed** `<input_audio>` [slow_factor] [quality] [output_format] [bitrate] [preview] [keep_video] – Audio verlangsamen\n"
+                "**/slowed_reverb** `<input_audio>` [impulse_audio] [slow_factor] [quality] [room_size] [decay] [damping] [output_format] [bitrate] [preview] [keep_video] – Reverb + Slowed\n"
+                "**/reverb** `<input_audio>` [impulse_audio] [room_size] [decay] [damping] [output_format] [bitrate] [preview] [keep_video] – Nur Reverb (ohne Impulsantwort algorithmisch)\n"
+                "**/stereo** `<input_audio>` [output_format] [bitrate] – Mono → Stereo (Haas-Effekt)\n"
+                "**/mono** `<input_audio>` [output_format] [bitrate] – Stereo → Mono\n"
+                "**/fx** `<input_audio>` `<chain>` [impulse_audio] [quality] [output_format] [bitrate] [preview] [keep_video] – Effektkette, z.B. `slow:0.8|reverb|stereo` oder `room:3|slow:0.8`\n"
+                "**/fx_batch** `<chain>` `<audio_1>` [audio_2 … audio_8] [impulse_audio] [quality] [output_format] [bitrate] [as_zip] – Effektkette auf mehrere Dateien, Ergebnis als ZIP\n"
+                "**/audio_cache** – Statistik der Audio-Caches"
             )
         )
 
         embed.add_field(
             name="🟧 **Grafik**", inline=False,
             value=(
-                "**/watermark** `<input_file>` `<watermark_file>` [position] [scale] [transparency] – Wasserzeichen hinzufügen\n"
-                "**/sw** `<input_file>` – Bild/Video in Schwarz‑Weiß konvertieren\n"
+                "**/watermark** `<input_file>` `<watermark_file>` [position] [scale] [transparency] [output_format] [quality] [compression] – Wasserzeichen hinzufügen\n"
+                "**/sw** `<input_file>` [output_format] [quality] [compression] – Bild/Video in Schwarz‑Weiß konvertieren\n"
                 "**/image** `<prompt>` – Generiert ein Bild mit DALL·E 3"
             )
         )
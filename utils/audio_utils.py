@@ -1,155 +1,1952 @@
 import io
+import os
+import json
+import mmap
+import asyncio
+import hashlib
+import weakref
+import subprocess
+import tempfile
+import threading
+import uuid
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fractions import Fraction
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
 import numpy as np
-from scipy import signal
+from scipy import fft, linalg, signal
 from scipy.io import wavfile
+import aiohttp
 import discord
 
+# Blockgröße (Samples) für die blockweise Verarbeitung
+BLOCK_SIZE = 16384
+# Verarbeitungs-Datentyp für Integer-PCM (Float-Eingaben behalten ihren Typ)
+AUDIO_DTYPE = np.float32
+# Qualitätsstufen des polyphasen Resamplings: (max. Nenner des Verhältnisses, Filterhalblänge je Phase, Kaiser-Beta)
+RESAMPLE_QUALITY = {
+    'fast': (64, 4, 5.0),
+    'balanced': (256, 10, 5.0),
+    'high': (1024, 24, 8.6),
+}
+# Videoformate, deren Tonspur verarbeitet werden kann: Endung -> (ffmpeg-Muxer, Audio-Codec beim Remux)
+VIDEO_FORMATS = {
+    '.mp4': ('mp4', 'aac'),
+    '.mov': ('mov', 'aac'),
+    '.mkv': ('matroska', 'aac'),
+    '.webm': ('webm', 'libopus'),
+}
+# Über ffmpeg dekodierbare Formate
+DECODER_FORMATS = ('.wav', '.mp3', '.ogg', '.flac', '.m4a') + tuple(VIDEO_FORMATS)
+# Ausgabeformate: (Dateiendung, ffmpeg-Muxer, ffmpeg-Codec, verlustbehaftet)
+OUTPUT_FORMATS = {
+    'wav': ('wav', None, None, False),
+    'flac': ('flac', 'flac', 'flac', False),
+    'opus': ('ogg', 'ogg', 'libopus', True),
+    'mp3': ('mp3', 'mp3', 'libmp3lame', True),
+}
+# Ausweichkette bei zu großer Ausgabe: (Format, Bitrate in kbit/s), absteigend nach Größe
+OUTPUT_FALLBACKS = [('flac', None), ('mp3', 192), ('opus', 128), ('opus', 64), ('opus', 32)]
+# Ergebnis-Cache der Audio-Befehle: Verzeichnis und maximale Größe
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'audio_result_cache'))
+RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', '512'))
+# Version der Verarbeitung; bei Änderungen an Effekten oder Kodierung erhöhen, damit alte Einträge ungültig werden
+RESULT_CACHE_VERSION = 1
+# Impulsantwort-Cache: Anzahl Einträge im Speicher, optionales Auslagerungsverzeichnis und dessen maximale Größe
+IR_CACHE_SIZE = int(os.getenv('IR_CACHE_SIZE', '8'))
+IR_CACHE_DIR = os.getenv('IR_CACHE_DIR')
+IR_CACHE_MAX_MB = int(os.getenv('IR_CACHE_MAX_MB', '256'))
+# Kürzen von Impulsantworten: Schwelle der Energieabklingkurve (dB, leer = nicht kürzen) und Ausblendzeit
+IR_TRIM_DB = float(os.getenv('IR_TRIM_DB', '-60')) if os.getenv('IR_TRIM_DB', '-60') else None
+IR_FADE_MS = float(os.getenv('IR_FADE_MS', '10'))
+# Prozesspool für Audio-Effekte: Anzahl Worker und Verzeichnis für Array-Austausch (möglichst tmpfs)
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', str(os.cpu_count() or 1)))
+# Threads je FFT (scipy.fft-Backend); Standard: Kerne gleichmäßig auf die Pool-Worker verteilen
+AUDIO_FFT_WORKERS = int(os.getenv('AUDIO_FFT_WORKERS', str(max(1, (os.cpu_count() or 1) // AUDIO_WORKERS))))
+AUDIO_SHM_DIR = os.getenv('AUDIO_SHM_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+# Ausweichverzeichnis (Festplatte), wenn im Austauschverzeichnis zu wenig Platz frei ist
+AUDIO_SPILL_DIR = os.getenv('AUDIO_SPILL_DIR', tempfile.gettempdir())
+# Große Uploads: ab dieser Größe in eine temporäre Datei streamen und per Memory-Map lesen
+LARGE_UPLOAD_MB = int(os.getenv('LARGE_UPLOAD_MB', '32'))
+UPLOAD_TMP_DIR = os.getenv('UPLOAD_TMP_DIR', tempfile.gettempdir())
+# Verzögerungen der Hall-Leitungen (ms bei Raumgröße 1), paarweise teilerfremd in Samples gerundet
+FDN_DELAYS_MS = (29.7, 37.1, 41.1, 43.7, 53.0, 59.3, 67.9, 73.1)
+
+
+def _match_channels(data: np.ndarray, channels: int) -> np.ndarray:
+    """
+    Bildet ein 2D-Array auf die gewünschte Kanalzahl ab.
+
+    Mono wird per Broadcasting verteilt, andere Kanalzahlen werden zyklisch wiederholt.
+
+    :param data: Array (Samples, Kanäle).
+    :param channels: Ziel-Kanalzahl.
+    :return: Array (Samples, channels).
+    """
+    if data.shape[1] in (1, channels):
+        return data
+    return data[:, np.arange(channels) % data.shape[1]]
+
+
+class PartitionedConvolver:
+    """
+    Blockweise Faltung mit gleichmäßig partitionierter Impulsantwort (Overlap-Save).
+
+    Der Speicherbedarf hängt nur von Blockgröße und IR-Länge ab, nicht von der Signallänge.
+    """
+    def __init__(self, h: np.ndarray, channels: int, block_size: int = BLOCK_SIZE,
+                 spectra: np.ndarray | None = None, workers: int = AUDIO_FFT_WORKERS,
+                 dtype: np.dtype = AUDIO_DTYPE):
+        """
+        Zerlegt die Impulsantwort in Partitionen und transformiert diese.
+
+        :param h: Impulsantwort (1D oder 2D-Array).
+        :param channels: Anzahl der Ausgangskanäle.
+        :param block_size: Blockgröße in Samples.
+        :param spectra: Bereits berechnete Partitionsspektren (siehe partition_spectra).
+        :param workers: Threads je FFT (Kanäle werden parallel transformiert).
+        :param dtype: Float-Datentyp der Verarbeitung.
+        :return: None
+        """
+        self.block_size = block_size
+        self.channels = channels
+        self.workers = workers
+        self.ir_length = len(h)
+        if spectra is None:
+            spectra = self.partition_spectra(h, block_size, workers, dtype)
+        spectra = spectra.astype(np.result_type(dtype, np.complex64), copy=False)
+        # IR-Kanäle auf Ausgangskanäle abbilden (Partition, Frequenz, Kanal)
+        if spectra.shape[2] == 1:
+            self._spectra = np.broadcast_to(spectra, spectra.shape[:2] + (channels,))
+        else:
+            self._spectra = spectra[:, :, np.arange(channels) % spectra.shape[2]]
+        # Frequency-Domain-Delay-Line als Ringpuffer
+        self._fdl = np.zeros(self._spectra.shape, dtype=self._spectra.dtype)
+        self._pos = 0
+        self._buf = np.zeros((2 * block_size, channels), dtype=dtype)
+
+    @staticmethod
+    def partition_spectra(h: np.ndarray, block_size: int = BLOCK_SIZE,
+                          workers: int = AUDIO_FFT_WORKERS, dtype: np.dtype = AUDIO_DTYPE) -> np.ndarray:
+        """
+        Zerlegt die Impulsantwort in Partitionen und berechnet deren Spektren.
+
+        :param h: Impulsantwort (1D oder 2D-Array).
+        :param block_size: Blockgröße in Samples.
+        :param workers: Threads für die FFT.
+        :param dtype: Float-Datentyp der Verarbeitung.
+        :return: Spektren als Array (Partition, Frequenz, Kanal).
+        """
+        if h.ndim == 1:
+            h = h[:, None]
+        n_parts = max(1, -(-len(h) // block_size))
+        # IR in Partitionen zerlegen: (Partition, Sample, Kanal)
+        parts = np.zeros((n_parts * block_size, h.shape[1]), dtype=dtype)
+        parts[:len(h)] = h
+        parts = parts.reshape(n_parts, block_size, h.shape[1])
+        return fft.rfft(parts, n=2 * block_size, axis=1, workers=workers)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Faltet einen Eingangsblock und gibt den zugehörigen Ausgangsblock zurück.
+
+        Kürzere Blöcke werden mit Stille aufgefüllt; sie sind daher nur als letzter Block sinnvoll.
+
+        :param block: Eingangsblock (max. block_size Samples, 1D oder 2D).
+        :return: Ausgangsblock mit block_size Samples (2D-Array).
+        """
+        n = len(block)
+        if block.ndim == 1:
+            block = block[:, None]
+        block = _match_channels(block, self.channels)
+        bs = self.block_size
+        # Overlap-Save: alte Hälfte nach vorne, neuen Block hinten einsetzen
+        self._buf[:bs] = self._buf[bs:]
+        self._buf[bs:bs + n] = block
+        self._buf[bs + n:] = 0
+        self._pos = (self._pos + 1) % len(self._fdl)
+        self._fdl[self._pos] = fft.rfft(self._buf, axis=0, workers=self.workers)
+        # Spektren aller Partitionen mit passend verzögerten Eingangsspektren multiplizieren
+        k = self._pos
+        acc = np.einsum('pfc,pfc->fc', self._fdl[k::-1], self._spectra[:k + 1])
+        if k + 1 < len(self._fdl):
+            acc += np.einsum('pfc,pfc->fc', self._fdl[:k:-1], self._spectra[k + 1:])
+        return fft.irfft(acc, n=2 * bs, axis=0, workers=self.workers)[bs:]
+
+    def stream(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Faltet eine Folge von Eingangsblöcken inklusive Nachhall.
+
+        :param blocks: Eingangsblöcke (je block_size Samples, nur der letzte darf kürzer sein).
+        :return: Iterator über Ausgangsblöcke (Gesamtlänge: Eingang + IR - 1).
+        """
+        remaining = self.ir_length - 1
+        for block in blocks:
+            remaining += len(block)
+            n = min(remaining, self.block_size)
+            yield self.process(block)[:n]
+            remaining -= n
+        # Nachhall ausklingen lassen
+        silence = np.zeros((self.block_size, self.channels), dtype=self._buf.dtype)
+        while remaining > 0:
+            n = min(remaining, self.block_size)
+            yield self.process(silence)[:n]
+            remaining -= n
+
+
+class HaasWidener:
+    """
+    Blockweise Stereo-Verbreiterung per Haas-Effekt.
+
+    Tiefen (Butterworth-Tiefpass als Second-Order-Sections) bleiben auf beiden Kanälen gleich,
+    die Höhen werden rechts über einen Ringpuffer verzögert. Filterzustand und Ringpuffer werden
+    zwischen den Blöcken fortgeführt, sodass beliebig lange Signale gestreamt werden können.
+    """
+    def __init__(self, rate: int, delay_ms: float = 20, cutoff: float = 100, order: int = 4,
+                 dtype: np.dtype = AUDIO_DTYPE):
+        """
+        Entwirft die Frequenzweiche und legt den Verzögerungspuffer an.
+
+        :param rate: Abtastrate.
+        :param delay_ms: Verzögerung der Höhen im rechten Kanal.
+        :param cutoff: Trennfrequenz der Weiche in Hz.
+        :param order: Filterordnung.
+        :param dtype: Float-Datentyp der Ausgabe.
+        :return: None
+        """
+        self.dtype = np.dtype(dtype)
+        self.sos = signal.butter(order, cutoff, btype='low', output='sos', fs=rate)
+        self._zi = np.zeros((self.sos.shape[0], 2))
+        # Ringpuffer der Höhen; _ring[_pos] ist das älteste Sample
+        self._ring = np.zeros(max(int(rate * delay_ms / 1000), 0), dtype=self.dtype)
+        self._pos = 0
+
+    def _delay(self, high: np.ndarray, out: np.ndarray) -> None:
+        """
+        Addiert die um die Pufferlänge verzögerten Höhen auf out und schreibt high in den Puffer.
+
+        :param high: Höhen des aktuellen Blocks.
+        :param out: Zielkanal (wird in-place erhöht).
+        :return: None
+        """
+        d = len(self._ring)
+        if d == 0:
+            out += high
+            return
+        i = 0
+        while i < len(high):
+            k = min(len(high) - i, d - self._pos)
+            seg = slice(self._pos, self._pos + k)
+            out[i:i + k] += self._ring[seg]
+            self._ring[seg] = high[i:i + k]
+            self._pos = (self._pos + k) % d
+            i += k
+
+    def process(self, block: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Verarbeitet einen Mono-Block.
+
+        :param block: Mono-Block (int16 oder Float).
+        :param out: Optionaler Zielpuffer (len(block), 2).
+        :return: Stereo-Block (2D-Array).
+        """
+        if out is None:
+            out = np.empty((len(block), 2), dtype=self.dtype)
+        if len(block) == 0:
+            return out
+        # links: Original (= Tiefen + Höhen), auf [-1,1] skaliert
+        out[:, 0] = block
+        if not np.issubdtype(block.dtype, np.floating):
+            out[:, 0] *= out.dtype.type(1 / 32767.0)
+        low, self._zi = signal.sosfilt(self.sos, out[:, 0], zi=self._zi)
+        # rechts: Tiefen + verzögerte Höhen
+        out[:, 1] = low
+        self._delay(out[:, 0] - low.astype(self.dtype, copy=False), out[:, 1])
+        return out
+
+    def stream(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Verarbeitet einen Strom von Mono-Blöcken.
+
+        :param blocks: Iterable über Mono-Blöcke.
+        :return: Iterator über Stereo-Blöcke gleicher Länge.
+        """
+        for block in blocks:
+            yield self.process(block)
+
+
+class FeedbackDelayReverb:
+    """
+    Algorithmischer Hall als Feedback-Delay-Network (Hadamard-Rückkopplung, gedämpfte Leitungen).
+
+    Die Leitungen teilen sich einen Ringpuffer; verarbeitet wird in Teilblöcken bis zur kürzesten
+    Verzögerung, sodass jeder Teilblock vollständig vektorisiert berechnet werden kann. Puffer und
+    Dämpfungsfilter werden zwischen den Blöcken fortgeführt.
+    """
+    def __init__(self, rate: int, channels: int, room_size: float = 0.7, decay: float = 2.5,
+                 damping: float = 0.4, wet: float = 0.35, dtype: np.dtype = AUDIO_DTYPE):
+        """
+        Legt Verzögerungsleitungen, Rückkopplungsmatrix und Ausgangsabgriffe an.
+
+        :param rate: Abtastrate.
+        :param channels: Kanalzahl des Eingangs.
+        :param room_size: Raumgröße (skaliert die Verzögerungen, 0.1 bis 2).
+        :param decay: Nachhallzeit T60 in Sekunden.
+        :param damping: Dämpfung hoher Frequenzen je Durchlauf (0 bis 0.99).
+        :param wet: Pegel des Hallanteils relativ zum Originalsignal.
+        :param dtype: Float-Datentyp der Verarbeitung.
+        :return: None
+        """
+        if not 0.1 <= room_size <= 2:
+            raise ValueError('room_size muss zwischen 0.1 und 2 liegen')
+        if not 0.1 <= decay <= 30:
+            raise ValueError('decay muss zwischen 0.1 und 30 Sekunden liegen')
+        if not 0 <= damping <= 0.99:
+            raise ValueError('damping muss zwischen 0 und 0.99 liegen')
+        self.dtype = np.dtype(dtype)
+        self.channels = channels
+        self.out_channels = max(2, channels)
+        self.delays = np.maximum(np.round(np.array(FDN_DELAYS_MS) * room_size * rate / 1000), 1).astype(int)
+        lines = len(self.delays)
+        self.step = int(self.delays.min())
+        self._buf = np.zeros((int(self.delays.max()) + self.step, lines), dtype=self.dtype)
+        self._pos = 0
+        self._cols = np.arange(lines)
+        self._offsets = np.arange(self.step)[:, None] - self.delays[None, :]
+        # Rückkopplung: Leitungsdämpfung auf -60 dB nach decay Sekunden, dann verlustfreie Hadamard-Mischung
+        gains = 10.0 ** (-3.0 * self.delays / (decay * rate))
+        self.feedback = (gains[:, None] * linalg.hadamard(lines) / np.sqrt(lines)).astype(self.dtype)
+        # Tiefpass erster Ordnung je Leitung (Dämpfung der Höhen)
+        self._b = np.array([1.0 - damping])
+        self._a = np.array([1.0, -damping])
+        self._zi = np.zeros((1, lines))
+        # Ausgang: Leitungen abwechselnd auf die Kanäle, wechselnde Vorzeichen zur Dekorrelation
+        taps = np.zeros((lines, self.out_channels))
+        for i in range(lines):
+            taps[i, i % self.out_channels] = 1.0 if (i // self.out_channels) % 2 == 0 else -1.0
+        self.taps = (taps * wet / np.sqrt(lines / self.out_channels)).astype(self.dtype)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Verarbeitet einen Block (Original plus Hall).
+
+        :param block: Eingangsblock (1D oder 2D, int16 oder Float).
+        :return: Ausgangsblock (Samples, out_channels).
+        """
+        if block.ndim == 1:
+            block = block[:, None]
+        out = np.empty((len(block), self.out_channels), dtype=self.dtype)
+        out[:] = _match_channels(block, self.out_channels)
+        if not np.issubdtype(block.dtype, np.floating):
+            out *= self.dtype.type(1 / 32767.0)
+        feed = out[:, :self.channels].mean(axis=1)
+        size = len(self._buf)
+        for start in range(0, len(out), self.step):
+            k = min(self.step, len(out) - start)
+            # Leitungsausgänge: vor delays Samples geschriebene Werte
+            y = self._buf[(self._pos + self._offsets[:k]) % size, self._cols]
+            y, self._zi = signal.lfilter(self._b, self._a, y, axis=0, zi=self._zi)
+            out[start:start + k] += y @ self.taps
+            write = (self._pos + np.arange(k)) % size
+            self._buf[write] = y @ self.feedback
+            self._buf[write] += feed[start:start + k, None]
+            self._pos = (self._pos + k) % size
+        return out
+
+    def stream(self, blocks: Iterable[np.ndarray], tail: int, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+        """
+        Verarbeitet eine Folge von Blöcken und lässt den Hall anschließend ausklingen.
+
+        :param blocks: Eingangsblöcke.
+        :param tail: Länge des Ausklangs in Samples.
+        :param block_size: Blockgröße des Ausklangs.
+        :return: Iterator über Ausgangsblöcke.
+        """
+        for block in blocks:
+            yield self.process(block)
+        silence = np.zeros((block_size, self.channels), dtype=self.dtype)
+        while tail > 0:
+            n = min(tail, block_size)
+            yield self.process(silence[:n])
+            tail -= n
+
+
+class ImpulseResponseCache:
+    """
+    LRU-Cache für gekürzte, resamplete und transformierte Impulsantworten.
+
+    Schlüssel: SHA-256 der Attachment-Bytes, Zielrate, Blockgröße und Kürzungsschwelle.
+    Verdrängte Einträge werden optional als .npy-Dateien ausgelagert; die Auslagerung ist in der Größe
+    begrenzt (LRU nach Datei-mtime) und ein Eintrag wird gelöscht, sobald er wieder im Speicher liegt.
+    """
+    def __init__(self, max_entries: int = IR_CACHE_SIZE, spill_dir: str | None = IR_CACHE_DIR,
+                 max_spill_bytes: int = IR_CACHE_MAX_MB * 2 ** 20):
+        """
+        Initialisiert einen leeren Cache.
+
+        :param max_entries: Maximale Anzahl Einträge im Speicher.
+        :param spill_dir: Verzeichnis für ausgelagerte Einträge (None = keine Auslagerung).
+        :param max_spill_bytes: Maximale Gesamtgröße der ausgelagerten Einträge in Bytes.
+        :return: None
+        """
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(ir_bytes: bytes, rate: int, block_size: int, trim_db: float | None = None) -> str:
+        """
+        Erzeugt den Cache-Schlüssel.
+
+        :param ir_bytes: Rohdaten der Impulsantwort.
+        :param rate: Zielabtastrate.
+        :param block_size: Blockgröße der Faltung.
+        :param trim_db: Kürzungsschwelle (None = ungekürzt).
+        :return: Schlüssel als String.
+        """
+        return f'{hashlib.sha256(ir_bytes).hexdigest()}_{rate}_{block_size}_{trim_db}'
+
+    def _spill_paths(self, key: str) -> tuple[str, str, str]:
+        """
+        Liefert die Dateipfade eines ausgelagerten Eintrags.
+
+        :param key: Cache-Schlüssel.
+        :return: Tuple(Pfad IR, Pfad Spektren, Pfad Metadaten).
+        """
+        return (os.path.join(self.spill_dir, f'{key}_ir.npy'),
+                os.path.join(self.spill_dir, f'{key}_spectra.npy'),
+                os.path.join(self.spill_dir, f'{key}_info.json'))
+
+    def get(self, key: str) -> tuple[np.ndarray, np.ndarray, int] | None:
+        """
+        Sucht einen Eintrag im Speicher oder in der Auslagerung.
+
+        :param key: Cache-Schlüssel.
+        :return: Tuple(IR, Spektren, ursprüngliche IR-Länge) oder None.
+        """
+        with self.lock:
+            return self._lookup(key)
+
+    def _lookup(self, key: str) -> tuple[np.ndarray, np.ndarray, int] | None:
+        """
+        Sucht einen Eintrag und zählt Treffer/Fehlversuche (ohne Sperre).
+
+        :param key: Cache-Schlüssel.
+        :return: Tuple(IR, Spektren, ursprüngliche IR-Länge) oder None.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        if self.spill_dir:
+            ir_path, spectra_path, info_path = self._spill_paths(key)
+            if os.path.exists(ir_path) and os.path.exists(spectra_path):
+                h = np.load(ir_path)
+                try:
+                    with open(info_path, 'r') as f:
+                        original_length = json.load(f)['original_length']
+                except (OSError, ValueError, KeyError):
+                    original_length = len(h)
+                entry = (h, np.load(spectra_path), original_length)
+                # liegt wieder im Speicher; beim nächsten Verdrängen wird er erneut ausgelagert
+                for path in (ir_path, spectra_path, info_path):
+                    _remove_file(path)
+                self.hits += 1
+                self._store(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key: str, h: np.ndarray, spectra: np.ndarray, original_length: int | None = None) -> None:
+        """
+        Legt einen Eintrag ab und verdrängt ggf. den ältesten.
+
+        :param key: Cache-Schlüssel.
+        :param h: Gekürzte, resamplete Impulsantwort.
+        :param spectra: Partitionsspektren.
+        :param original_length: Länge der ungekürzten IR bei Zielrate (None = len(h)).
+        :return: None
+        """
+        with self.lock:
+            self._store(key, (h, spectra, len(h) if original_length is None else original_length))
+
+    def _store(self, key: str, entry: tuple[np.ndarray, np.ndarray, int]) -> None:
+        """
+        Speichert einen Eintrag im LRU und lagert verdrängte Einträge aus.
+
+        :param key: Cache-Schlüssel.
+        :param entry: Tuple(IR, Spektren, ursprüngliche IR-Länge).
+        :return: None
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            old_key, (old_h, old_spectra, old_length) = self.entries.popitem(last=False)
+            if self.spill_dir:
+                ir_path, spectra_path, info_path = self._spill_paths(old_key)
+                try:
+                    np.save(ir_path, old_h)
+                    np.save(spectra_path, old_spectra)
+                    with open(info_path, 'w') as f:
+                        json.dump({'original_length': int(old_length)}, f)
+                except OSError as e:
+                    print(f'IR-Cache: Auslagern fehlgeschlagen: {e}')
+                self._trim_spill()
+
+    def _trim_spill(self) -> None:
+        """
+        Löscht die am längsten nicht genutzten ausgelagerten Einträge, bis die Maximalgröße eingehalten ist.
+
+        :return: None
+        """
+        groups = {}
+        for name in os.listdir(self.spill_dir):
+            key, sep, suffix = name.rpartition('_')
+            if not sep or suffix not in ('ir.npy', 'spectra.npy', 'info.json'):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                size, mtime = os.path.getsize(path), os.path.getmtime(path)
+            except OSError:
+                continue
+            paths, total, newest = groups.get(key, ([], 0, 0.0))
+            groups[key] = (paths + [path], total + size, max(newest, mtime))
+        total_bytes = sum(total for _, total, _ in groups.values())
+        # LRU: älteste Auslagerungen zuerst löschen
+        for paths, total, _ in sorted(groups.values(), key=lambda g: g[2]):
+            if total_bytes <= self.max_spill_bytes:
+                break
+            for path in paths:
+                _remove_file(path)
+            total_bytes -= total
+
+    def stats(self) -> dict:
+        """
+        Liefert die Trefferstatistik.
+
+        :return: Dict mit hits, misses und entries.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+
+ir_cache = ImpulseResponseCache()
+
+
+class ResultCache:
+    """
+    Inhaltsadressierter Festplatten-Cache für kodierte Ergebnisse der Audio-Befehle.
+
+    Schlüssel: SHA-256 der Eingabedaten plus Effektname, Parameter, Verarbeitungsversion und ergebnisrelevante
+    Einstellungen. Die Größe ist begrenzt, verdrängt wird der am längsten nicht genutzte Eintrag
+    (Zugriffszeit = Datei-mtime).
+    """
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_MB * 2 ** 20):
+        """
+        Initialisiert den Cache und erfasst vorhandene Einträge.
+
+        :param directory: Cache-Verzeichnis.
+        :param max_bytes: Maximale Gesamtgröße in Bytes.
+        :return: None
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(p) for p, _ in self._entries())
+
+    @staticmethod
+    def make_key(effect: str, params: dict, *inputs) -> str:
+        """
+        Erzeugt den Cache-Schlüssel.
+
+        :param effect: Name des Effekts/Befehls.
+        :param params: Parameter, die das Ergebnis beeinflussen.
+        :param inputs: Rohdaten der Eingaben (Audio, Impulsantwort) oder AudioUpload-Objekte.
+        :return: Schlüssel als Hex-String.
+        """
+        digest = hashlib.sha256()
+        for data in inputs:
+            digest.update(data.digest if isinstance(data, AudioUpload) else hashlib.sha256(data).digest())
+        digest.update(json.dumps([effect, params], sort_keys=True).encode())
+        # nach Deploys oder geänderter Konfiguration keine veralteten Ergebnisse ausliefern
+        settings = [RESULT_CACHE_VERSION, BLOCK_SIZE, np.dtype(AUDIO_DTYPE).name, IR_TRIM_DB, IR_FADE_MS,
+                    RESAMPLE_QUALITY, FDN_DELAYS_MS, OUTPUT_FALLBACKS]
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entries(self) -> list[tuple[str, float]]:
+        """
+        Listet alle Cache-Dateien.
+
+        :return: Liste von (Pfad, mtime).
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((path, os.path.getmtime(path)))
+            except OSError:
+                pass
+        return entries
+
+    def _find(self, key: str) -> str | None:
+        """
+        Sucht die Datei zu einem Schlüssel (Dateiname: <Schlüssel>.<Format>).
+
+        :param key: Cache-Schlüssel.
+        :return: Pfad oder None.
+        """
+        for fmt in list(OUTPUT_FORMATS) + [ext[1:] for ext in VIDEO_FORMATS]:
+            path = os.path.join(self.directory, f'{key}.{fmt}')
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, key: str, limit: int | None = None) -> tuple[bytes, str] | None:
+        """
+        Liefert ein gespeichertes Ergebnis.
+
+        :param key: Cache-Schlüssel.
+        :param limit: Maximale Größe; größere Einträge zählen als Fehlversuch.
+        :return: Tuple(kodierte Datei, Format) oder None.
+        """
+        with self.lock:
+            path = self._find(key)
+            if path is None or (limit is not None and os.path.getsize(path) > limit):
+                self.misses += 1
+                return None
+            with open(path, 'rb') as f:
+                encoded = f.read()
+            os.utime(path)
+            self.hits += 1
+            self.bytes_saved += len(encoded)
+            return encoded, path.rsplit('.', 1)[1]
+
+    def put(self, key: str, encoded: bytes, fmt: str) -> None:
+        """
+        Speichert ein Ergebnis und verdrängt bei Bedarf alte Einträge.
+
+        :param key: Cache-Schlüssel.
+        :param encoded: Kodierte Datei.
+        :param fmt: Ausgabeformat bzw. Videoendung (Remux).
+        :return: None
+        """
+        if len(encoded) > self.max_bytes:
+            return
+        with self.lock:
+            old = self._find(key)
+            if old is not None:
+                self.total_bytes -= os.path.getsize(old)
+                os.remove(old)
+            path = os.path.join(self.directory, f'{key}.{fmt}')
+            tmp = f'{path}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+            self.total_bytes += len(encoded)
+            # LRU: älteste Zugriffe zuerst löschen
+            if self.total_bytes > self.max_bytes:
+                for old_path, _ in sorted(self._entries(), key=lambda e: e[1]):
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    if old_path == path:
+                        continue
+                    try:
+                        size = os.path.getsize(old_path)
+                        os.remove(old_path)
+                        self.total_bytes -= size
+                    except OSError:
+                        pass
+
+    def stats(self) -> dict:
+        """
+        Liefert die Cache-Statistik.
+
+        :return: Dict mit hits, misses, hit_rate, bytes_saved und total_bytes.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'total_bytes': self.total_bytes,
+        }
+
+
+result_cache = ResultCache()
+
+
+class SharedArray:
+    """
+    Verweis auf ein Array in einer memory-mapped Datei zum Austausch zwischen Prozessen.
+    """
+    def __init__(self, path: str, layout: tuple | None = None, owned: bool | None = None):
+        """
+        Initialisiert den Verweis.
+
+        :param path: Pfad der .npy-Datei bzw. der gemappten Datei.
+        :param layout: (dtype, shape, offset) für Rohdaten ohne .npy-Header (z.B. WAV), sonst None.
+        :param owned: Ob unlink() die Datei löschen darf (Standard: nur ohne layout).
+        :return: None
+        """
+        self.path = path
+        self.layout = layout
+        self.owned = layout is None if owned is None else owned
+
+    @classmethod
+    def from_memmap(cls, arr: np.ndarray) -> 'SharedArray | None':
+        """
+        Verweist auf die Datei hinter einer bestehenden Memory-Map, ohne die Daten zu kopieren.
+
+        :param arr: Zusammenhängende View auf ein np.memmap.
+        :return: SharedArray-Verweis oder None, wenn das Array nicht direkt abbildbar ist.
+        """
+        mm = getattr(arr, '_mmap', None)
+        if not isinstance(arr, np.memmap) or arr.filename is None or mm is None \
+                or not arr.flags.c_contiguous:
+            return None
+        # bereits gelöschte Austauschdateien (z.B. Pool-Ergebnisse) lassen sich nicht erneut öffnen
+        if not os.path.exists(arr.filename):
+            return None
+        # Dateioffset = Beginn der Abbildung + Abstand der View zum Abbildungsbeginn
+        start = arr.offset - arr.offset % mmap.ALLOCATIONGRANULARITY
+        offset = start + arr.ctypes.data - np.frombuffer(mm, dtype=np.uint8).ctypes.data
+        return cls(arr.filename, (arr.dtype.str, arr.shape, offset))
+
+    @classmethod
+    def allocate(cls, dtype, shape: tuple, directory: str = AUDIO_SHM_DIR) -> tuple['SharedArray', np.memmap]:
+        """
+        Legt eine .npy-Datei an und reserviert ihren Platz vollständig.
+
+        Reicht der freie Platz im Verzeichnis (z.B. ein kleines /dev/shm) nicht, wird AUDIO_SPILL_DIR genutzt.
+        Die Reservierung per posix_fallocate meldet fehlenden Platz als Fehler statt später als SIGBUS.
+
+        :param dtype: Datentyp.
+        :param shape: Form des Arrays.
+        :param directory: Bevorzugtes Verzeichnis.
+        :return: Tuple(SharedArray-Verweis, beschreibbare Memory-Map).
+        """
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        candidates = [directory] if directory == AUDIO_SPILL_DIR else [directory, AUDIO_SPILL_DIR]
+        for candidate in candidates:
+            if shutil.disk_usage(candidate).free < nbytes + (1 << 20):
+                continue
+            shared = cls(os.path.join(candidate, f'audio_{uuid.uuid4().hex}.npy'))
+            out = np.lib.format.open_memmap(shared.path, mode='w+', dtype=dtype, shape=shape)
+            try:
+                fd = os.open(shared.path, os.O_RDWR)
+                try:
+                    os.posix_fallocate(fd, 0, os.fstat(fd).st_size)
+                finally:
+                    os.close(fd)
+            except OSError:
+                del out
+                shared.unlink()
+                continue
+            return shared, out
+        raise ValueError('Nicht genug Speicherplatz für den Audio-Austausch')
+
+    @classmethod
+    def create(cls, arr: np.ndarray, directory: str = AUDIO_SHM_DIR) -> 'SharedArray':
+        """
+        Legt ein Array als .npy-Datei ab.
+
+        :param arr: Zu teilendes Array.
+        :param directory: Zielverzeichnis.
+        :return: SharedArray-Verweis.
+        """
+        shared, out = cls.allocate(arr.dtype, arr.shape, directory)
+        out[...] = arr
+        out.flush()
+        del out
+        return shared
+
+    def load(self) -> np.ndarray:
+        """
+        Öffnet das Array als Memory-Map (ohne Kopie).
+
+        :return: Array-View auf die Datei.
+        """
+        if self.layout is not None:
+            dtype, shape, offset = self.layout
+            return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        return np.load(self.path, mmap_mode='r')
+
+    def unlink(self) -> None:
+        """
+        Löscht die Datei; bestehende Memory-Maps bleiben gültig. Fremde Dateien bleiben unberührt.
+
+        :return: None
+        """
+        if not self.owned:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# Austauschverzeichnis für Ausgabe-Arrays, solange ein Pool-Job im Worker läuft (sonst None)
+_exchange_dir = None
+
+
+def _run_pool_job(func, args: tuple, kwargs: dict, directory: str, started: str | None = None):
+    """
+    Führt einen Audio-Job im Worker-Prozess aus.
+
+    :param func: Auszuführende Funktion (picklebar, z.B. AudioEffects-Methode).
+    :param args: Positionsargumente (Arrays als SharedArray).
+    :param kwargs: Schlüsselwortargumente (Arrays als SharedArray).
+    :param directory: Verzeichnis für das Ergebnis-Array.
+    :param started: Markierungsdatei, die beim Start des Jobs angelegt wird (None = keine).
+    :return: Ergebnis (Arrays als SharedArray).
+    """
+    global _exchange_dir
+    if started is not None:
+        # zeigt dem Hauptprozess nach einem Absturz, dass der Job bereits in einem Worker lief
+        open(started, 'wb').close()
+    args = [a.load() if isinstance(a, SharedArray) else a for a in args]
+    kwargs = {k: v.load() if isinstance(v, SharedArray) else v for k, v in kwargs.items()}
+    # Ausgabe-Arrays (AudioEffects.empty) direkt als Austauschdateien anlegen
+    _exchange_dir = directory
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        _exchange_dir = None
+    if isinstance(result, np.ndarray):
+        # liegt das Ergebnis bereits in einer Austauschdatei, nur den Verweis zurückgeben (keine Kopie)
+        base = result
+        while getattr(base, 'exchange', None) is None and isinstance(base.base, np.ndarray):
+            base = base.base
+        exchange = getattr(base, 'exchange', None)
+        ref = SharedArray.from_memmap(result) if exchange is not None and exchange.alive else None
+        if ref is not None:
+            exchange.detach()
+            ref.owned = True
+            return ref
+        return SharedArray.create(result, directory)
+    return result
+
+
+class AudioWorkerPool:
+    """
+    Verwalteter Prozesspool, der Audio-Effekte außerhalb der Event-Loop ausführt.
+
+    Arrays werden über memory-mapped Dateien übergeben statt als gepickelte Kopien.
+    """
+    def __init__(self, workers: int = AUDIO_WORKERS, directory: str = AUDIO_SHM_DIR):
+        """
+        Initialisiert den Pool (Prozesse werden beim ersten Job gestartet).
+
+        :param workers: Anzahl Worker-Prozesse.
+        :param directory: Verzeichnis für den Array-Austausch.
+        :return: None
+        """
+        self.workers = max(1, workers)
+        self.directory = directory
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        Liefert den Executor und startet ihn bei Bedarf.
+
+        :return: ProcessPoolExecutor.
+        """
+        if self._executor is None:
+            # Worker nicht vom laufenden Bot-Prozess (mit aktiven Threads) forken
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Führt func(*args, **kwargs) in einem Worker-Prozess aus und wartet asynchron auf das Ergebnis.
+
+        :param func: Picklebare Funktion, z.B. AudioEffects.slow_audio.
+        :param args: Positionsargumente (NumPy-Arrays werden geteilt).
+        :param kwargs: Schlüsselwortargumente (NumPy-Arrays werden geteilt).
+        :return: Ergebnis der Funktion (Arrays als Memory-Map).
+        """
+        shared = []
+        started = os.path.join(self.directory, f'job_{uuid.uuid4().hex}.started')
+
+        def share(value):
+            if isinstance(value, np.ndarray):
+                # bereits dateibasierte Arrays (z.B. gemappte WAV-Uploads) nur referenzieren
+                ref = SharedArray.from_memmap(value)
+                value = ref if ref is not None else SharedArray.create(value, self.directory)
+                shared.append(value)
+            return value
+
+        try:
+            job_args = tuple(share(a) for a in args)
+            job_kwargs = {k: share(v) for k, v in kwargs.items()}
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    result = await loop.run_in_executor(executor, _run_pool_job, func, job_args, job_kwargs,
+                                                        self.directory, started)
+                    break
+                except BrokenProcessPool:
+                    # Ein Worker ist abgestürzt (z.B. OOM): nur den defekten Pool ersetzen, nicht einen
+                    # inzwischen von einem anderen Job neu gestarteten
+                    if self._executor is executor:
+                        self.shutdown()
+                    # Jobs, die bereits liefen, können selbst die Ursache sein und werden nicht wiederholt
+                    if attempt or os.path.exists(started):
+                        raise BrokenProcessPool('Audio-Worker abgestürzt, vermutlich zu wenig Speicher '
+                                                'für diese Eingabe') from None
+        finally:
+            _remove_file(started)
+            for item in shared:
+                item.unlink()
+        if isinstance(result, SharedArray):
+            arr = result.load()
+            # Datei erst löschen, wenn das Ergebnis nicht mehr referenziert wird; weitere Pool-Jobs
+            # (z.B. die Kodierung) erhalten sie so per Verweis statt als Kopie
+            weakref.finalize(arr, _remove_file, result.path)
+            return arr
+        return result
+
+    def shutdown(self) -> None:
+        """
+        Beendet den Pool.
+
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+audio_pool = AudioWorkerPool()
+
+
+class AudioDecoder:
+    """
+    Dekodiert Audiodaten über einen ffmpeg-Subprozess zu float32-PCM.
+
+    Die Rohdaten werden per stdin (oder als Dateipfad) übergeben, das PCM wird blockweise von stdout gelesen.
+    Bei Videos wird nur die Tonspur demultiplext, Videoframes werden nicht dekodiert.
+    """
+    def __init__(self, file_bytes: bytes | None = None, path: str | None = None,
+                 max_seconds: float | None = None):
+        """
+        Initialisiert den Decoder.
+
+        :param file_bytes: Inhalt der Audiodatei.
+        :param path: Alternativ: Pfad der Audiodatei.
+        :param max_seconds: Nur die ersten Sekunden dekodieren (None = ganze Datei).
+        :return: None
+        """
+        self.file_bytes = file_bytes
+        self.path = path
+        self.max_seconds = max_seconds
+        self.source = path if path is not None else 'pipe:0'
+        self.rate = None
+        self.channels = None
+        self.duration = None
+
+    def probe(self) -> tuple[int, int]:
+        """
+        Ermittelt Abtastrate, Kanalzahl und Dauer per ffprobe (liest nur die Header).
+
+        :return: Tuple(rate, channels).
+        """
+        cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+            '-show_entries', 'stream=sample_rate,channels:format=duration',
+            '-of', 'json', '-i', self.source
+        ]
+        result = subprocess.run(cmd, input=self.file_bytes, capture_output=True)
+        if result.returncode != 0:
+            raise ValueError(f'FFprobe Fehler: {result.stderr.decode(errors="replace")}')
+        info = json.loads(result.stdout)
+        if not info.get('streams'):
+            raise ValueError('Keine Audiospur gefunden')
+        stream = info['streams'][0]
+        self.rate = int(stream['sample_rate'])
+        self.channels = int(stream['channels'])
+        duration = info.get('format', {}).get('duration')
+        self.duration = float(duration) if duration not in (None, 'N/A') else None
+        return self.rate, self.channels
+
+    def _start(self) -> subprocess.Popen:
+        """
+        Startet ffmpeg und speist die Rohdaten in einem Thread ein.
+
+        :return: Laufender Prozess.
+        """
+        if self.rate is None:
+            self.probe()
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', self.source, '-map', '0:a:0', '-vn',
+            '-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1'
+        ]
+        if self.max_seconds is not None:
+            # ffmpeg bricht nach dem Ausschnitt ab, der Rest der Datei wird nicht dekodiert
+            cmd[-1:-1] = ['-t', f'{self.max_seconds:g}']
+        if self.path is not None:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        else:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # stderr parallel leeren, sonst blockiert ffmpeg bei vielen Fehlermeldungen (volle Pipe)
+        proc.stderr_chunks = []
+        proc.stderr_reader = threading.Thread(target=lambda: proc.stderr_chunks.append(proc.stderr.read()),
+                                              daemon=True)
+        proc.stderr_reader.start()
+        if self.path is not None:
+            return proc
+
+        def feed():
+            try:
+                proc.stdin.write(self.file_bytes)
+                proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+        threading.Thread(target=feed, daemon=True).start()
+        return proc
+
+    @staticmethod
+    def _finish(proc: subprocess.Popen) -> None:
+        """
+        Wartet auf ffmpeg und prüft den Rückgabewert.
+
+        :param proc: Laufender Prozess.
+        :return: None
+        """
+        proc.stderr_reader.join()
+        stderr = b''.join(proc.stderr_chunks)
+        proc.stdout.close()
+        proc.stderr.close()
+        if proc.wait() != 0:
+            raise ValueError(f'FFmpeg Fehler: {stderr.decode(errors="replace")}')
+
+    def decode(self) -> tuple[int, np.ndarray]:
+        """
+        Dekodiert die ganze Datei direkt in einen vorallokierten Puffer.
+
+        :return: Tuple(rate, Audio-Daten als float32-Array, Mono als 1D).
+        """
+        proc = self._start()
+        frame_bytes = 4 * self.channels
+        # Puffergröße aus der Dauer schätzen, bei Bedarf vergrößern
+        duration = self.duration or 10.0
+        if self.max_seconds is not None:
+            duration = min(duration, self.max_seconds)
+        frames = int(duration * self.rate * 1.05) + BLOCK_SIZE
+        out = np.empty((frames, self.channels), dtype=np.float32)
+        filled = 0
+        try:
+            while True:
+                if filled == len(out) * frame_bytes:
+                    grown = np.empty((2 * len(out), self.channels), dtype=np.float32)
+                    grown[:len(out)] = out
+                    out = grown
+                view = memoryview(out).cast('B')[filled:]
+                n = proc.stdout.readinto(view)
+                if not n:
+                    break
+                filled += n
+        except BaseException:
+            proc.kill()
+            raise
+        self._finish(proc)
+        out = out[:filled // frame_bytes]
+        if self.channels == 1:
+            out = out[:, 0]
+        return self.rate, out
+
+
+def is_video(filename: str) -> bool:
+    """
+    Prüft anhand der Endung, ob eine Datei ein Video ist.
+
+    :param filename: Dateiname.
+    :return: True bei unterstütztem Videoformat.
+    """
+    return filename.lower().endswith(tuple(VIDEO_FORMATS))
+
+
+def _remove_file(path: str) -> None:
+    """
+    Löscht eine Datei, falls vorhanden.
+
+    :param path: Dateipfad.
+    :return: None
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class AudioUpload:
+    """
+    Eingelesenes Audio-Attachment: kleine Dateien als Bytes im Speicher, große als temporäre Datei.
+
+    Große WAV-Dateien werden per Memory-Map gelesen; die temporäre Datei wird gelöscht, sobald weder
+    der Upload noch daraus geladene Arrays referenziert werden.
+    """
+    def __init__(self, filename: str, file_bytes: bytes | None = None, path: str | None = None,
+                 digest: bytes | None = None):
+        """
+        Initialisiert den Upload.
+
+        :param filename: Dateiname (bestimmt das Format).
+        :param file_bytes: Inhalt der Datei (kleine Uploads).
+        :param path: Pfad der temporären Datei (große Uploads).
+        :param digest: SHA-256 des Inhalts, falls bereits bekannt.
+        :return: None
+        """
+        self.filename = filename
+        self.file_bytes = file_bytes
+        self.path = path
+        self._digest = digest
+        if path is not None:
+            self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    @classmethod
+    async def fetch(cls, attachment: discord.Attachment, threshold: int = LARGE_UPLOAD_MB * 2 ** 20,
+                    directory: str = UPLOAD_TMP_DIR, chunk_size: int = 2 ** 20) -> 'AudioUpload':
+        """
+        Lädt ein Attachment; ab threshold Bytes wird es blockweise in eine temporäre Datei gestreamt.
+
+        :param attachment: Discord Attachment.
+        :param threshold: Größe, ab der auf die Platte gestreamt wird.
+        :param directory: Verzeichnis der temporären Datei.
+        :param chunk_size: Größe der gelesenen Blöcke.
+        :return: AudioUpload.
+        """
+        if attachment.size < threshold:
+            return cls(attachment.filename, file_bytes=await attachment.read())
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(attachment.filename)[1], dir=directory)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(attachment.url) as r:
+                        if r.status != 200:
+                            raise ValueError(f'Download fehlgeschlagen: HTTP {r.status}')
+                        async for chunk in r.content.iter_chunked(chunk_size):
+                            digest.update(chunk)
+                            f.write(chunk)
+        except BaseException:
+            _remove_file(path)
+            raise
+        return cls(attachment.filename, path=path, digest=digest.digest())
+
+    @property
+    def digest(self) -> bytes:
+        """
+        SHA-256 des Dateiinhalts (für den Ergebnis-Cache).
+
+        :return: Digest als Bytes.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.file_bytes).digest()
+        return self._digest
+
+    @property
+    def is_video(self) -> bool:
+        """
+        Ob der Upload ein Video ist.
+
+        :return: True bei Videoformat.
+        """
+        return is_video(self.filename)
+
+    def ensure_file(self, directory: str = UPLOAD_TMP_DIR) -> str:
+        """
+        Liefert einen Dateipfad zum Upload und schreibt kleine Uploads dafür einmalig auf die Platte.
+
+        :param directory: Verzeichnis der temporären Datei.
+        :return: Pfad der Datei.
+        """
+        if self.path is None:
+            fd, path = tempfile.mkstemp(suffix=os.path.splitext(self.filename)[1], dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.file_bytes)
+            self.path = path
+            self._finalizer = weakref.finalize(self, _remove_file, path)
+            self.file_bytes = None
+        return self.path
+
+    def load(self, max_seconds: float | None = None) -> tuple[int, np.ndarray]:
+        """
+        Dekodiert den Upload. Große WAV-Dateien werden ohne Kopie auf die Datei abgebildet,
+        bei Videos wird nur die Tonspur gelesen.
+
+        :param max_seconds: Nur den Anfang laden (None = ganze Datei); der Upload bleibt danach erhalten.
+        :return: Tuple(rate, Audio-Daten als NumPy-Array).
+        """
+        if self.is_video:
+            # Videos bleiben als Datei erhalten (seekbare Eingabe, späteres Remuxen)
+            return AudioEffects.load_audio_from_file(self.ensure_file(), self.filename, max_seconds)
+        if self.path is None:
+            return AudioEffects.load_audio_from_bytes(self.file_bytes, self.filename, max_seconds)
+        rate, data = AudioEffects.load_audio_from_file(self.path, self.filename, max_seconds)
+        if isinstance(data, np.memmap):
+            # Datei lebt so lange wie die Memory-Map
+            data.upload = self
+        elif max_seconds is None:
+            self.close()
+        return rate, data
+
+    def close(self) -> None:
+        """
+        Löscht die temporäre Datei sofort.
+
+        :return: None
+        """
+        if self.path is not None:
+            self._finalizer()
+            self.path = None
+
+
+class AudioEncoder:
+    """
+    Kodiert Audio (WAV, FLAC, Opus, MP3); komprimierte Formate blockweise über einen ffmpeg-Subprozess.
+    """
+    @staticmethod
+    def estimate_size(data: np.ndarray, rate: int, fmt: str, bitrate: int | None) -> int:
+        """
+        Schätzt die Größe der kodierten Datei.
+
+        :param data: Audiodaten (Samples, Kanäle).
+        :param rate: Abtastrate.
+        :param fmt: Ausgabeformat.
+        :param bitrate: Bitrate in kbit/s (verlustbehaftete Formate).
+        :return: Geschätzte Größe in Bytes.
+        """
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        pcm_size = len(data) * channels * 2
+        if fmt == 'wav':
+            return pcm_size + 44
+        if fmt == 'flac':
+            return int(pcm_size * 0.6)
+        return int(len(data) / rate * bitrate * 1000 / 8)
+
+    @staticmethod
+    def encode(data: np.ndarray, rate: int, fmt: str = 'wav', bitrate: int | None = 192,
+               block_size: int = BLOCK_SIZE) -> bytes:
+        """
+        Kodiert normalisiertes Audio; PCM wird blockweise an den Encoder übergeben.
+
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param rate: Abtastrate.
+        :param fmt: Ausgabeformat (wav, flac, opus, mp3).
+        :param bitrate: Bitrate in kbit/s (verlustbehaftete Formate).
+        :param block_size: Blockgröße der Übergabe.
+        :return: Kodierte Datei als Bytes.
+        """
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f'Unbekanntes Ausgabeformat: {fmt}')
+        if fmt == 'wav':
+            return AudioEffects.to_wav_bytes(data, rate)
+        _, muxer, codec, lossy = OUTPUT_FORMATS[fmt]
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        cmd = [
+            'ffmpeg', '-v', 'error', '-f', 's16le', '-ar', str(rate), '-ac', str(channels),
+            '-i', 'pipe:0', '-c:a', codec
+        ]
+        if lossy:
+            cmd += ['-b:a', f'{bitrate}k']
+        cmd += ['-f', muxer, 'pipe:1']
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        feeder = AudioEncoder._feed_pcm(proc, data, block_size)
+        stderr_chunks = []
+        reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+        reader.start()
+        encoded = proc.stdout.read()
+        feeder.join()
+        reader.join()
+        if proc.wait() != 0:
+            raise ValueError(f'FFmpeg Fehler: {b"".join(stderr_chunks).decode(errors="replace")}')
+        return encoded
+
+    @staticmethod
+    def _feed_pcm(proc: subprocess.Popen, data: np.ndarray, block_size: int = BLOCK_SIZE) -> threading.Thread:
+        """
+        Schreibt Audio als 16-Bit-PCM blockweise in einem Thread an stdin des Prozesses.
+
+        :param proc: Laufender ffmpeg-Prozess.
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param block_size: Blockgröße der Übergabe.
+        :return: Gestarteter Thread.
+        """
+        def feed():
+            # PCM blockweise umwandeln und schreiben, ein Puffer für alle Blöcke
+            pcm = np.empty((block_size,) + data.shape[1:], dtype=np.int16)
+            try:
+                for start in range(0, len(data), block_size):
+                    block = data[start:start + block_size]
+                    out = AudioEffects.to_pcm16(block, pcm[:len(block)])
+                    proc.stdin.write(out.tobytes())
+                proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        return feeder
+
+    @staticmethod
+    def remux_video(video_path: str, data: np.ndarray, rate: int, bitrate: int = 192, time_scale: float = 1.0,
+                    block_size: int = BLOCK_SIZE) -> tuple[bytes, str]:
+        """
+        Legt bearbeitetes Audio auf die unveränderte Videospur (-c:v copy, kein Neukodieren des Videos).
+
+        :param video_path: Pfad des Originalvideos.
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param rate: Abtastrate.
+        :param bitrate: Audio-Bitrate in kbit/s.
+        :param time_scale: Zeitstreckung der Videospur (-itsscale, weiterhin Stream-Copy), z.B. 1/slow_factor.
+        :param block_size: Blockgröße der PCM-Übergabe.
+        :return: Tuple(Video als Bytes, Dateiendung ohne Punkt).
+        """
+        ext = os.path.splitext(video_path)[1].lower()
+        if ext not in VIDEO_FORMATS:
+            raise ValueError(f'Kein unterstütztes Videoformat: {ext}')
+        muxer, codec = VIDEO_FORMATS[ext]
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        fd, out_path = tempfile.mkstemp(suffix=ext, dir=UPLOAD_TMP_DIR)
+        os.close(fd)
+        # Zeitstempel der Videospur strecken, damit Bild und verlangsamtes Audio synchron bleiben
+        scale = ['-itsscale', f'{time_scale:.9g}'] if time_scale != 1 else []
+        cmd = [
+            'ffmpeg', '-v', 'error', '-y', *scale, '-i', video_path,
+            '-f', 's16le', '-ar', str(rate), '-ac', str(channels), '-i', 'pipe:0',
+            '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy', '-c:a', codec, '-b:a', f'{bitrate}k'
+        ]
+        if muxer in ('mp4', 'mov'):
+            cmd += ['-movflags', '+faststart']
+        cmd += ['-f', muxer, out_path]
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            feeder = AudioEncoder._feed_pcm(proc, data, block_size)
+            stderr = proc.stderr.read()
+            feeder.join()
+            if proc.wait() != 0:
+                raise ValueError(f'FFmpeg Fehler: {stderr.decode(errors="replace")}')
+            with open(out_path, 'rb') as f:
+                return f.read(), ext[1:]
+        finally:
+            _remove_file(out_path)
+
+    @staticmethod
+    def encode_within_limit(data: np.ndarray, rate: int, fmt: str, bitrate: int | None,
+                            limit: int) -> tuple[bytes, str]:
+        """
+        Kodiert Audio und weicht auf kleinere Formate aus, falls das Ergebnis das Limit überschreitet.
+
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param rate: Abtastrate.
+        :param fmt: Gewünschtes Ausgabeformat.
+        :param bitrate: Gewünschte Bitrate in kbit/s.
+        :param limit: Maximale Dateigröße in Bytes.
+        :return: Tuple(kodierte Datei, verwendetes Format).
+        """
+        requested = AudioEncoder.estimate_size(data, rate, fmt, bitrate)
+        candidates = [(fmt, bitrate)] + [(f, b) for f, b in OUTPUT_FALLBACKS
+                                         if AudioEncoder.estimate_size(data, rate, f, b) < requested]
+        for cand_fmt, cand_bitrate in candidates:
+            if AudioEncoder.estimate_size(data, rate, cand_fmt, cand_bitrate) > limit:
+                continue
+            encoded = AudioEncoder.encode(data, rate, cand_fmt, cand_bitrate)
+            if len(encoded) <= limit:
+                return encoded, cand_fmt
+        raise ValueError('Ausgabedatei überschreitet das Upload-Limit')
+
+
 class AudioEffects:
     """
     Bietet Methoden zum Laden und Bearbeiten von Audiodateien.
     """
     @staticmethod
-    async def load_audio_from_attachment(attachment: discord.Attachment) -> tuple[int, np.ndarray]:
+    def load_audio_from_bytes(file_bytes: bytes, filename: str,
+                              max_seconds: float | None = None) -> tuple[int, np.ndarray]:
         """
-        Liest Audio aus Discord-Attachment ein (.wav oder .mp3).
+        Liest Audio aus Rohdaten ein (Audiodatei oder Tonspur eines Videos).
 
-        :param attachment: Discord Attachment mit Audiodatei.
+        :param file_bytes: Inhalt der Audiodatei.
+        :param filename: Dateiname (bestimmt das Format).
+        :param max_seconds: Nur die ersten Sekunden liefern (None = ganze Datei).
         :return: Tuple(rate, Audio-Daten als NumPy-Array).
         """
-        file_bytes = await attachment.read()
-        name = attachment.filename.lower()
-        # WAV-Datei
+        name = filename.lower()
+        if not name.endswith(DECODER_FORMATS):
+            raise ValueError(f'Nur {", ".join(DECODER_FORMATS)} unterstützt')
+        # WAV-Datei: direkt einlesen, ffmpeg nur für von scipy nicht lesbare Varianten
+        if name.endswith('.wav'):
+            try:
+                with io.BytesIO(file_bytes) as f:
+                    rate, data = wavfile.read(f)
+                return rate, AudioEffects.head(data, rate, max_seconds)
+            except ValueError:
+                pass
+        # Videocontainer (z.B. MP4 mit moov-Atom am Ende) brauchen eine seekbare Eingabe
+        if is_video(name):
+            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1], dir=UPLOAD_TMP_DIR) as f:
+                f.write(file_bytes)
+                f.flush()
+                return AudioDecoder(path=f.name, max_seconds=max_seconds).decode()
+        # komprimierte Formate über ffmpeg
+        return AudioDecoder(file_bytes, max_seconds=max_seconds).decode()
+
+    @staticmethod
+    def load_audio_from_file(path: str, filename: str,
+                             max_seconds: float | None = None) -> tuple[int, np.ndarray]:
+        """
+        Liest Audio aus einer Datei; WAV wird per Memory-Map abgebildet statt vollständig geladen.
+
+        :param path: Pfad der Audiodatei.
+        :param filename: Ursprünglicher Dateiname (bestimmt das Format).
+        :param max_seconds: Nur die ersten Sekunden dekodieren (None = ganze Datei).
+        :return: Tuple(rate, Audio-Daten als NumPy-Array, bei WAV als np.memmap).
+        """
+        name = filename.lower()
+        if not name.endswith(DECODER_FORMATS):
+            raise ValueError(f'Nur {", ".join(DECODER_FORMATS)} unterstützt')
         if name.endswith('.wav'):
-            with io.BytesIO(file_bytes) as f:
-                rate, data = wavfile.read(f)
-            return rate, data
-        # MP3-Datei
-        if name.endswith('.mp3'):
-            seg = AudioSegment.from_file(io.BytesIO(file_bytes), format='mp3')
-            samples = np.array(seg.get_array_of_samples())
-            rate = seg.frame_rate
-            # Stereo umformen
-            if seg.channels == 2:
-                samples = samples.reshape((-1, 2))
-            return rate, samples
-        raise ValueError('Nur .wav oder .mp3 unterstützt')
+            try:
+                rate, data = wavfile.read(path, mmap=True)
+                return rate, AudioEffects.head(data, rate, max_seconds)
+            except ValueError:
+                pass
+        # komprimierte Formate (und z.B. 24-Bit-WAV) über ffmpeg direkt aus der Datei
+        return AudioDecoder(path=path, max_seconds=max_seconds).decode()
+
+    @staticmethod
+    def head(data: np.ndarray, rate: int, max_seconds: float | None) -> np.ndarray:
+        """
+        Schneidet die ersten Sekunden aus (View, keine Kopie).
+
+        :param data: Audiodaten (Samples, Kanäle).
+        :param rate: Abtastrate.
+        :param max_seconds: Länge in Sekunden (None = alles).
+        :return: Anfang der Audiodaten.
+        """
+        if max_seconds is None:
+            return data
+        return data[:int(max_seconds * rate)]
+
+    @staticmethod
+    def float_dtype(data: np.ndarray) -> np.dtype:
+        """
+        Bestimmt den Verarbeitungs-Datentyp (Float bleibt erhalten, Integer-PCM wird float32).
+
+        :param data: Audiodaten.
+        :return: Float-Datentyp.
+        """
+        if np.issubdtype(data.dtype, np.floating):
+            return data.dtype
+        return np.dtype(AUDIO_DTYPE)
+
+    @staticmethod
+    def empty(shape: tuple, dtype) -> np.ndarray:
+        """
+        Allokiert ein Ausgabe-Array; im Pool-Worker direkt in einer Austauschdatei, damit das Ergebnis
+        ohne weitere Kopie an den Hauptprozess geht.
+
+        :param shape: Form des Arrays.
+        :param dtype: Datentyp.
+        :return: Uninitialisiertes Array (im Worker als Memory-Map, Datei wird mit dem Array gelöscht).
+        """
+        if _exchange_dir is None:
+            return np.empty(shape, dtype)
+        shared, out = SharedArray.allocate(dtype, shape, _exchange_dir)
+        out.exchange = weakref.finalize(out, _remove_file, shared.path)
+        return out
+
+    @staticmethod
+    def normalize(data: np.ndarray) -> np.ndarray:
+        """
+        Normalisiert Audio in-place auf Spitzenwert 1.
+
+        :param data: Beschreibbares Float-Array.
+        :return: Dasselbe Array.
+        """
+        if data.size == 0:
+            return data
+        m = max(data.max(), -data.min())
+        if m > 0:
+            data *= data.dtype.type(1 / m)
+        return data
+
+    @staticmethod
+    def to_pcm16(data: np.ndarray, out: np.ndarray | None = None,
+                 block_size: int = BLOCK_SIZE) -> np.ndarray:
+        """
+        Wandelt Float-Audio in 16-Bit-PCM um (blockweise Begrenzung, direkt in den Zielpuffer).
+
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param out: Vorallokierter int16-Puffer gleicher Form (optional).
+        :param block_size: Blockgröße der Umwandlung.
+        :return: int16-Array.
+        """
+        if out is None:
+            out = np.empty(data.shape, dtype=np.int16)
+        tmp = np.empty((min(block_size, len(data)),) + data.shape[1:], dtype=AudioEffects.float_dtype(data))
+        for start in range(0, len(data), block_size):
+            block = data[start:start + block_size]
+            t = tmp[:len(block)]
+            np.clip(block, -1.0, 1.0, out=t)
+            t *= 32767
+            np.copyto(out[start:start + block_size], t, casting='unsafe')
+        return out
+
+    @staticmethod
+    def resample_ratio(ratio: float, quality: str = 'balanced') -> tuple[int, int]:
+        """
+        Nähert ein Resampling-Verhältnis durch einen Bruch up/down an.
+
+        :param ratio: Verhältnis Ausgangs- zu Eingangslänge.
+        :param quality: Qualitätsstufe (fast, balanced, high).
+        :return: Tuple(up, down).
+        """
+        max_den = RESAMPLE_QUALITY[quality][0]
+        frac = Fraction(ratio).limit_denominator(max_den)
+        if frac <= 0:
+            raise ValueError('Ungültiges Resampling-Verhältnis')
+        return frac.numerator, frac.denominator
+
+    @staticmethod
+    def design_resample_filter(up: int, down: int, quality: str = 'balanced') -> np.ndarray:
+        """
+        Entwirft den Anti-Aliasing-Tiefpass für polyphases Resampling.
+
+        :param up: Upsampling-Faktor.
+        :param down: Downsampling-Faktor.
+        :param quality: Qualitätsstufe (fast, balanced, high).
+        :return: FIR-Koeffizienten.
+        """
+        _, taps, beta = RESAMPLE_QUALITY[quality]
+        max_rate = max(up, down)
+        return signal.firwin(2 * taps * max_rate + 1, 1 / max_rate, window=('kaiser', beta))
 
     @staticmethod
-    def refined_resample_audio(audio: np.ndarray, orig_rate: int, target_rate: int) -> np.ndarray:
+    def iter_resample_poly(data: np.ndarray, up: int, down: int, quality: str = 'balanced',
+                           block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+        """
+        Resampled Audio blockweise polyphas um den Faktor up/down.
+
+        Jeder Block wird mit Kontext aus den Nachbarblöcken gefiltert, sodass das Ergebnis
+        dem Resampling des ganzen Signals entspricht.
+
+        :param data: Audiodaten (Samples entlang Achse 0).
+        :param up: Upsampling-Faktor.
+        :param down: Downsampling-Faktor.
+        :param quality: Qualitätsstufe (fast, balanced, high).
+        :param block_size: Ungefähre Blockgröße in Eingangssamples.
+        :return: Iterator über resamplete Blöcke.
         """
-        Resampled Audio auf neue Abtastrate mit FFT.
+        dtype = AudioEffects.float_dtype(data)
+        h = AudioEffects.design_resample_filter(up, down, quality).astype(dtype)
+        n = len(data)
+        n_out = -(-n * up // down)
+        # Block und Kontext auf Vielfache von down runden, damit die Ausgabe exakt anschließt
+        step = -(-block_size // down) * down
+        context = -(-((len(h) // 2) // up + 1) // down) * down
+        for start in range(0, n, step):
+            lo = max(0, start - context)
+            hi = min(n, start + step + context)
+            y = signal.resample_poly(data[lo:hi].astype(dtype, copy=False), up, down, axis=0, window=h)
+            offset = (start - lo) * up // down
+            count = min(step * up // down, n_out - start * up // down)
+            yield y[offset:offset + count]
+
+    @staticmethod
+    def resample(data: np.ndarray, ratio: float, quality: str = 'balanced',
+                 block_size: int = BLOCK_SIZE) -> np.ndarray:
+        """
+        Resampled Audio um ein Längenverhältnis (polyphas, blockweise).
+
+        :param data: Audiodaten (Samples entlang Achse 0).
+        :param ratio: Verhältnis Ausgangs- zu Eingangslänge.
+        :param quality: Qualitätsstufe des polyphasen Resamplings (fast, balanced, high).
+        :param block_size: Blockgröße des polyphasen Resamplings.
+        :return: Resampltes Audio.
+        """
+        up, down = AudioEffects.resample_ratio(ratio, quality)
+        out = AudioEffects.empty((-(-len(data) * up // down),) + data.shape[1:], AudioEffects.float_dtype(data))
+        pos = 0
+        for block in AudioEffects.iter_resample_poly(data, up, down, quality, block_size):
+            out[pos:pos + len(block)] = block
+            pos += len(block)
+        return out
+
+    @staticmethod
+    def refined_resample_audio(audio: np.ndarray, orig_rate: int, target_rate: int,
+                               quality: str = 'balanced') -> np.ndarray:
+        """
+        Resampled Audio auf neue Abtastrate.
 
         :param audio: Originale Audiodaten.
         :param orig_rate: Originalrate.
         :param target_rate: Zielrate.
+        :param quality: Qualitätsstufe des polyphasen Resamplings (fast, balanced, high).
         :return: Resampltes Audio.
         """
         if orig_rate == target_rate:
             return audio
-        length = int(len(audio) * target_rate / orig_rate)
-        return signal.resample(audio, length)
+        return AudioEffects.resample(audio, target_rate / orig_rate, quality)
+
+    @staticmethod
+    def to_wav_bytes(data: np.ndarray, rate: int) -> bytes:
+        """
+        Kodiert normalisiertes Audio als 16-Bit-WAV.
+
+        :param data: Audiodaten im Bereich [-1, 1].
+        :param rate: Abtastrate.
+        :return: WAV-Datei als Bytes.
+        """
+        buf = io.BytesIO()
+        wavfile.write(buf, rate, AudioEffects.to_pcm16(data))
+        return buf.getvalue()
+
+    @staticmethod
+    def load_impulse_response(ir_bytes: bytes, filename: str, target_rate: int, block_size: int = BLOCK_SIZE,
+                              trim_db: float | None = IR_TRIM_DB) -> tuple[np.ndarray, np.ndarray, bool, int]:
+        """
+        Lädt eine Impulsantwort über den IR-Cache (Dekodieren, Kürzen, Resampling, Partitionsspektren).
+
+        :param ir_bytes: Rohdaten der Impulsantwort.
+        :param filename: Dateiname der Impulsantwort.
+        :param target_rate: Abtastrate des Eingangssignals.
+        :param block_size: Blockgröße der Faltung.
+        :param trim_db: Kürzungsschwelle der Energieabklingkurve (None = nicht kürzen).
+        :return: Tuple(IR, Spektren, Cache-Treffer, ursprüngliche IR-Länge bei Zielrate).
+        """
+        key = ir_cache.make_key(ir_bytes, target_rate, block_size, trim_db)
+        entry = ir_cache.get(key)
+        if entry is not None:
+            return entry[0], entry[1], True, entry[2]
+        rate_h, h = AudioEffects.load_audio_from_bytes(ir_bytes, filename)
+        original_length = int(round(len(h) * target_rate / rate_h))
+        # vor dem Resampling kürzen: spart auch dessen Aufwand
+        if trim_db is not None:
+            h = AudioEffects.trim_impulse_response(h, rate_h, trim_db)
+        h = AudioEffects.refined_resample_audio(h, rate_h, target_rate)
+        spectra = PartitionedConvolver.partition_spectra(h, block_size)
+        ir_cache.put(key, h, spectra, original_length)
+        return h, spectra, False, original_length
+
+    @staticmethod
+    def trim_impulse_response(h: np.ndarray, rate: int, threshold_db: float = -60.0,
+                              fade_ms: float = IR_FADE_MS, downmix: bool = True) -> np.ndarray:
+        """
+        Kürzt eine Impulsantwort anhand ihrer Energieabklingkurve (Schroeder-Rückwärtsintegration).
+
+        Ein flacher Rauschteppich am Ende wird vorab abgeschnitten, danach wird dort gekürzt, wo die
+        Abklingkurve unter threshold_db fällt, und kurz ausgeblendet. Identische Stereo-Kanäle werden
+        optional zu Mono zusammengefasst.
+
+        :param h: Impulsantwort (1D oder 2D-Array).
+        :param rate: Abtastrate der Impulsantwort.
+        :param threshold_db: Schwelle der Abklingkurve relativ zur Gesamtenergie.
+        :param fade_ms: Länge der Ausblendung in ms.
+        :param downmix: Identische Kanäle zu Mono zusammenfassen.
+        :return: Gekürzte Impulsantwort (Float).
+        """
+        if downmix and h.ndim == 2 and h.shape[1] > 1 and np.array_equal(h, np.repeat(h[:, :1], h.shape[1], 1)):
+            h = h[:, 0]
+        energy = np.square(h, dtype=np.float64)
+        if energy.ndim == 2:
+            energy = energy.sum(axis=1)
+        n = len(energy)
+        # Rauschteppich: letzte 10 % in zwei Hälften; nahezu gleicher Pegel = flacher Boden
+        window = max(1, int(rate * 0.01))
+        tail = energy[-max(2 * window, n // 10):]
+        half = len(tail) // 2
+        first, second = (tail[:half].mean(), tail[half:].mean()) if half else (0.0, 0.0)
+        if first > 0 and second > 0 and abs(10 * np.log10(first / second)) < 1.0:
+            # Ende des Abklingens: letztes 10-ms-Fenster deutlich (6 dB) über dem Rauschteppich
+            frames = n // window
+            levels = energy[:frames * window].reshape(frames, window).mean(axis=1)
+            above = np.nonzero(levels > 4 * (first + second) / 2)[0]
+            if len(above):
+                n = min(n, (above[-1] + 1) * window)
+        # Energieabklingkurve und Schnittpunkt
+        edc = np.cumsum(energy[:n][::-1])[::-1]
+        if edc[0] > 0:
+            below = np.nonzero(edc < edc[0] * 10 ** (threshold_db / 10))[0]
+            if len(below):
+                n = min(n, int(below[0]))
+        out = h[:max(n, 1)].astype(AudioEffects.float_dtype(h))
+        # Raised-Cosine-Ausblendung nur am Schnitt und höchstens über die hintere Hälfte
+        fade = min(max(1, int(rate * fade_ms / 1000)), len(out) // 2) if len(out) < len(energy) else 0
+        if fade:
+            ramp = (0.5 + 0.5 * np.cos(np.linspace(0, np.pi, fade))).astype(out.dtype)
+            out[len(out) - fade:] *= ramp if out.ndim == 1 else ramp[:, None]
+        return out
+
+    @staticmethod
+    def iter_blocks(data: np.ndarray, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+        """
+        Zerlegt Audiodaten in Blöcke (Views, keine Kopien).
+
+        :param data: Audiodaten.
+        :param block_size: Blockgröße in Samples.
+        :return: Iterator über Blöcke.
+        """
+        for start in range(0, len(data), block_size):
+            yield data[start:start + block_size]
 
     @staticmethod
-    def refined_convolve_audio(x: np.ndarray, h: np.ndarray) -> np.ndarray:
+    def refined_convolve_audio(x: np.ndarray, h: np.ndarray, block_size: int = BLOCK_SIZE,
+                               spectra: np.ndarray | None = None, normalize: bool = True) -> np.ndarray:
         """
-        Faltet Signal x mit Impulsantwort h (FFT-Convolution).
+        Faltet Signal x mit Impulsantwort h (partitionierte Blockfaltung).
 
         :param x: Eingangssignal (NumPy-Array).
         :param h: Impulsantwort (NumPy-Array).
-        :return: Ausgabesignal (Stereo Array).
+        :param block_size: Blockgröße der Faltung in Samples.
+        :param spectra: Vorberechnete Partitionsspektren von h (z.B. aus dem IR-Cache).
+        :param normalize: Auf Spitzenwert 1 normalisieren.
+        :return: Ausgabesignal (Samples, Kanäle), mindestens Stereo.
         """
-        # sicherstellen: 2D-Arrays
+        # sicherstellen: 2D-Arrays (Samples, Kanäle)
         if x.ndim == 1:
             x = x[:, None]
         if h.ndim == 1:
             h = h[:, None]
-        # vier Fälle: mono/stereo-Kombinationen
-        if x.shape[1] == 1 and h.shape[1] == 1:
-            y = signal.fftconvolve(x[:,0], h[:,0], mode='full')
-            y = np.column_stack((y, y))
-        elif x.shape[1] == 1 and h.shape[1] == 2:
-            l = signal.fftconvolve(x[:,0], h[:,0], mode='full')
-            r = signal.fftconvolve(x[:,0], h[:,1], mode='full')
-            y = np.column_stack((l, r))
-        elif x.shape[1] == 2 and h.shape[1] == 1:
-            l = signal.fftconvolve(x[:,0], h[:,0], mode='full')
-            r = signal.fftconvolve(x[:,1], h[:,0], mode='full')
-            y = np.column_stack((l, r))
-        else:
-            l = signal.fftconvolve(x[:,0], h[:,0], mode='full')
-            r = signal.fftconvolve(x[:,1], h[:,1], mode='full')
-            y = np.column_stack((l, r))
+        # Kanalzuordnung: gleiche Kanalzahl paarweise, Mono wird verteilt, sonst zyklisch
+        channels = max(x.shape[1], h.shape[1])
+        dtype = AudioEffects.float_dtype(x)
+        conv = PartitionedConvolver(h, channels, block_size, spectra, dtype=dtype)
+        y = AudioEffects.empty((len(x) + len(h) - 1, max(2, channels)), dtype)
+        pos = 0
+        for out in conv.stream(AudioEffects.iter_blocks(x, block_size)):
+            # mono*mono: Ergebnis wird auf beide Kanäle gelegt
+            y[pos:pos + len(out)] = out
+            pos += len(out)
         # normalisieren
-        m = np.max(np.abs(y))
-        if m > 0:
-            y = y / m
-        return y
+        return AudioEffects.normalize(y) if normalize else y
+
+    @staticmethod
+    def algorithmic_reverb(x: np.ndarray, rate: int, room_size: float = 0.7, decay: float = 2.5,
+                           damping: float = 0.4, wet: float = 0.35, block_size: int = BLOCK_SIZE,
+                           normalize: bool = True) -> np.ndarray:
+        """
+        Fügt algorithmischen Hall hinzu (Feedback-Delay-Network, keine Impulsantwort nötig).
+
+        :param x: Eingangssignal (NumPy-Array).
+        :param rate: Abtastrate.
+        :param room_size: Raumgröße (0.1 bis 2).
+        :param decay: Nachhallzeit T60 in Sekunden.
+        :param damping: Dämpfung hoher Frequenzen (0 bis 0.99).
+        :param wet: Pegel des Hallanteils.
+        :param block_size: Blockgröße in Samples.
+        :param normalize: Auf Spitzenwert 1 normalisieren.
+        :return: Ausgabesignal inkl. Ausklang (Samples, Kanäle), mindestens Stereo.
+        """
+        if x.ndim == 1:
+            x = x[:, None]
+        reverb = FeedbackDelayReverb(rate, x.shape[1], room_size, decay, damping, wet,
+                                     dtype=AudioEffects.float_dtype(x))
+        tail = int(decay * rate)
+        y = AudioEffects.empty((len(x) + tail, reverb.out_channels), reverb.dtype)
+        pos = 0
+        for out in reverb.stream(AudioEffects.iter_blocks(x, block_size), tail, block_size):
+            y[pos:pos + len(out)] = out
+            pos += len(out)
+        return AudioEffects.normalize(y) if normalize else y
 
     @staticmethod
-    def slow_audio(data: np.ndarray, slow_factor: float = 0.85) -> np.ndarray:
+    def slow_audio(data: np.ndarray, slow_factor: float = 0.85, quality: str = 'balanced',
+                   normalize: bool = True) -> np.ndarray:
         """
         Verlangsamt das Audio um Faktor (längerer Stream).
 
         :param data: Audiodaten.
         :param slow_factor: Verlangsamungsfaktor (<1 beschleunigt).
+        :param quality: Qualitätsstufe des polyphasen Resamplings (fast, balanced, high).
+        :param normalize: Auf Spitzenwert 1 normalisieren.
         :return: Verlangsamtes Audio (Array).
         """
-        new_len = int(len(data) / slow_factor)
-        # mono oder stereo
-        if data.ndim == 1:
-            arr = signal.resample(data, new_len)
-        else:
-            l = signal.resample(data[:,0], new_len)
-            r = signal.resample(data[:,1], new_len)
-            arr = np.column_stack((l, r))
+        if slow_factor <= 0:
+            raise ValueError('slow_factor muss positiv sein')
+        # mono oder mehrkanalig: Resampling entlang der Sample-Achse
+        arr = AudioEffects.resample(data, 1 / slow_factor, quality)
         # normalisieren
-        m = np.max(np.abs(arr))
-        if m > 0:
-            arr = arr / m
-        return arr
+        return AudioEffects.normalize(arr) if normalize else arr
 
     @staticmethod
-    def mono_to_stereo(mono_audio: np.ndarray, rate: int, delay_ms: int = 20) -> np.ndarray:
+    def mono_to_stereo(mono_audio: np.ndarray, rate: int, delay_ms: int = 20,
+                       normalize: bool = True) -> np.ndarray:
         """
         Wandelt Mono zu Stereo mittels Haas-Effekt.
 
         :param mono_audio: Mono-Signal.
         :param rate: Abtastrate.
         :param delay_ms: Verzögerung rechter Kanal.
+        :param normalize: Auf Spitzenwert 1 normalisieren.
         :return: Stereo-Signal (2D-Array).
         """
-        # auf [-1,1] skalieren
-        if not np.issubdtype(mono_audio.dtype, np.floating):
-            mono_audio = mono_audio.astype(np.float32) / 32767.0
-        # Subbass/Highsplit via Butterworth
-        nyq = rate/2
-        b,a = signal.butter(4, 100/nyq, btype='low')
-        low = signal.filtfilt(b, a, mono_audio)
-        high = mono_audio - low
-        # rechter Kanal verzögern
-        d = int(rate * delay_ms/1000)
-        high_del = np.concatenate((np.zeros(d), high))[:len(high)]
-        left = low + high
-        right = low + high_del
-        stereo = np.column_stack((left, right))
+        dtype = AudioEffects.float_dtype(mono_audio)
+        stereo = AudioEffects.empty((len(mono_audio), 2), dtype)
+        widener = HaasWidener(rate, delay_ms, dtype=dtype)
+        pos = 0
+        # Filterzustand und Verzögerung laufen über die Blockgrenzen weiter
+        for out in widener.stream(AudioEffects.iter_blocks(mono_audio)):
+            stereo[pos:pos + len(out)] = out
+            pos += len(out)
         # normalisieren
-        m = np.max(np.abs(stereo))
-        if m > 0:
-            stereo = stereo / m
-        return stereo
+        return AudioEffects.normalize(stereo) if normalize else stereo
 
     @staticmethod
-    def stereo_to_mono(stereo_audio: np.ndarray) -> np.ndarray:
+    def stereo_to_mono(stereo_audio: np.ndarray, normalize: bool = True) -> np.ndarray:
         """
-        Wandelt Stereo zu Mono durch Mittelung beider Kanäle.
+        Wandelt Stereo (oder Mehrkanal) zu Mono durch Mittelung aller Kanäle.
 
-        :param stereo_audio: Stereo-Signal (2D-Array).
+        :param stereo_audio: Mehrkanal-Signal (2D-Array).
+        :param normalize: Auf Spitzenwert 1 normalisieren.
         :return: Mono-Signal.
         """
-        if not np.issubdtype(stereo_audio.dtype, np.floating):
-            stereo_audio = stereo_audio.astype(np.float32) / 32767.0
-        mono = np.mean(stereo_audio, axis=1)
-        m = np.max(np.abs(mono))
-        if m > 0:
-            mono = mono / m
-        return mono
\ No newline at end of file
+        dtype = AudioEffects.float_dtype(stereo_audio)
+        mono = np.mean(stereo_audio, axis=1, dtype=dtype, out=AudioEffects.empty((len(stereo_audio),), dtype))
+        return AudioEffects.normalize(mono) if normalize else mono
+
+
+class EffectChain:
+    """
+    Verkettete Audio-Effekte, z.B. 'slow:0.8|reverb|stereo' oder 'room:3|slow:0.8'.
+
+    Alle Stufen laufen in einem Durchgang auf dem Float-Puffer; normalisiert wird nur einmal am Ende.
+    """
+    # Stufe -> Name des Parameters (None = kein Parameter)
+    STAGES = {'slow': 'slow_factor', 'reverb': None, 'room': 'decay', 'stereo': 'delay_ms', 'mono': None}
+    # Standardwerte der Parameter, falls in der Kette keiner angegeben ist
+    DEFAULTS = {'slow': 0.85, 'room': 2.5, 'stereo': 20}
+
+    def __init__(self, stages: list[tuple[str, float | None]]):
+        """
+        Initialisiert die Kette.
+
+        :param stages: Liste von (Stufe, Parameter).
+        :return: None
+        """
+        self.stages = stages
+
+    @classmethod
+    def parse(cls, spec: str) -> 'EffectChain':
+        """
+        Liest eine Kette im Format 'stufe[:parameter]|stufe[:parameter]|...'.
+
+        :param spec: Kettenbeschreibung.
+        :return: EffectChain.
+        """
+        stages = []
+        for part in spec.split('|'):
+            name, _, arg = part.strip().partition(':')
+            name = name.strip().lower()
+            arg = arg.strip()
+            if not name:
+                raise ValueError('Leere Stufe in der Effektkette')
+            if name not in cls.STAGES:
+                raise ValueError(f'Unbekannter Effekt: {name}')
+            value = None
+            if arg and cls.STAGES[name] is not None:
+                try:
+                    value = float(arg.replace(',', '.'))
+                except ValueError:
+                    raise ValueError(f'Ungültiger Parameter für {name}: {arg}')
+                if name == 'slow' and value <= 0:
+                    raise ValueError('slow_factor muss positiv sein')
+            stages.append((name, value))
+        return cls(stages)
+
+    @property
+    def needs_impulse(self) -> bool:
+        """
+        Ob die Kette eine Impulsantwort benötigt.
+
+        :return: True, falls eine reverb-Stufe enthalten ist.
+        """
+        return any(name == 'reverb' for name, _ in self.stages)
+
+    def param(self, name: str, value: float | None) -> float | None:
+        """
+        Liefert den Parameter einer Stufe; nur ein fehlender Wert (None) wird durch den Standard ersetzt.
+
+        :param name: Name der Stufe.
+        :param value: Angegebener Parameter oder None.
+        :return: Parameter (0 bleibt 0).
+        """
+        return self.DEFAULTS.get(name) if value is None else value
+
+    @property
+    def time_scale(self) -> float:
+        """
+        Faktor, um den die Kette die Dauer verändert (Produkt der slow-Stufen).
+
+        :return: Dauer Ausgabe / Dauer Eingabe (ohne Hallfahne).
+        """
+        scale = 1.0
+        for name, value in self.stages:
+            if name == 'slow':
+                scale /= self.param(name, value)
+        return scale
+
+    def describe(self) -> str:
+        """
+        Liefert eine kanonische Beschreibung der Kette.
+
+        :return: Beschreibung, z.B. 'slow:0.8|reverb'.
+        """
+        return '|'.join(name if value is None else f'{name}:{value:g}' for name, value in self.stages)
+
+    def run(self, data: np.ndarray, rate: int, h: np.ndarray | None = None,
+            spectra: np.ndarray | None = None, quality: str = 'balanced', room_size: float = 0.7,
+            damping: float = 0.4) -> np.ndarray:
+        """
+        Wendet alle Stufen nacheinander an und normalisiert einmal am Ende.
+
+        :param data: Audiodaten.
+        :param rate: Abtastrate.
+        :param h: Impulsantwort für reverb-Stufen.
+        :param spectra: Partitionsspektren der Impulsantwort.
+        :param quality: Resampling-Qualität für slow-Stufen.
+        :param room_size: Raumgröße für room-Stufen (algorithmischer Hall).
+        :param damping: Dämpfung für room-Stufen.
+        :return: Normalisiertes Ergebnis.
+        """
+        for name, value in self.stages:
+            if name == 'slow':
+                data = AudioEffects.slow_audio(data, self.param(name, value), quality=quality, normalize=False)
+            elif name == 'reverb':
+                if h is None:
+                    raise ValueError('reverb benötigt eine Impulsantwort')
+                data = AudioEffects.refined_convolve_audio(data, h, spectra=spectra, normalize=False)
+            elif name == 'room':
+                data = AudioEffects.algorithmic_reverb(data, rate, room_size, self.param(name, value), damping,
+                                                       normalize=False)
+            elif name == 'stereo':
+                if data.ndim == 2:
+                    data = AudioEffects.stereo_to_mono(data, normalize=False)
+                data = AudioEffects.mono_to_stereo(data, rate, int(self.param(name, value)), normalize=False)
+            elif name == 'mono' and data.ndim == 2:
+                data = AudioEffects.stereo_to_mono(data, normalize=False)
+        if not np.issubdtype(data.dtype, np.floating) or not data.flags.writeable:
+            out = AudioEffects.empty(data.shape, AudioEffects.float_dtype(data))
+            out[...] = data
+            data = out
+        return AudioEffects.normalize(data)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import asyncio
+
+# Maximale Anzahl gleichzeitig laufender ffmpeg-Prozesse
+FFMPEG_PROCESSES = int(os.getenv('FFMPEG_PROCESSES', str(max(1, os.cpu_count() or 1))))
+# Zeitlimit je Aufruf in Sekunden (unter der Gültigkeit eines Interaction-Tokens von 15 Minuten)
+FFMPEG_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT', '600'))
+# Blockgröße beim Schreiben an stdin
+PIPE_CHUNK = 1 << 20
+
+
+class FFmpegError(Exception):
+    """
+    Fehler eines ffmpeg-/ffprobe-Aufrufs mit Rückgabecode und Fehlerausgabe.
+    """
+    def __init__(self, returncode: int, stderr: str):
+        """
+        Initialisiert den Fehler.
+
+        :param returncode: Rückgabecode des Prozesses.
+        :param stderr: Fehlerausgabe (ohne Fortschrittszeilen).
+        :return: None
+        """
+        super().__init__(f'FFmpeg Fehler ({returncode}): {stderr}')
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegRunner:
+    """
+    Führt ffmpeg-Aufrufe als asyncio-Subprozesse aus, ohne den Event-Loop zu blockieren.
+
+    Begrenzt die Anzahl gleichzeitiger Prozesse, beendet Prozesse bei Zeitüberschreitung oder Abbruch
+    und meldet den Fortschritt aus der -progress-Ausgabe.
+    """
+    def __init__(self, max_processes: int = FFMPEG_PROCESSES, timeout: float = FFMPEG_TIMEOUT):
+        """
+        Initialisiert den Runner.
+
+        :param max_processes: Maximale Anzahl gleichzeitiger Prozesse.
+        :param timeout: Standard-Zeitlimit in Sekunden (None = unbegrenzt).
+        :return: None
+        """
+        self.max_processes = max(1, max_processes)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_processes)
+
+    @staticmethod
+    async def _feed(proc: asyncio.subprocess.Process, data: bytes | None) -> None:
+        """
+        Schreibt die Eingabe blockweise an stdin und schließt die Pipe.
+
+        :param proc: Laufender Prozess.
+        :param data: Eingabe als Bytes oder None.
+        :return: None
+        """
+        if proc.stdin is None:
+            return
+        try:
+            view = memoryview(data or b'')
+            for start in range(0, len(view), PIPE_CHUNK):
+                proc.stdin.write(view[start:start + PIPE_CHUNK])
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg hat die Eingabe vorzeitig geschlossen; der Fehler steht dann in stderr
+            pass
+
+    @staticmethod
+    async def _read_stderr(stream: asyncio.StreamReader, on_progress) -> str:
+        """
+        Liest stderr zeilenweise, reicht Fortschrittsblöcke weiter und sammelt die übrigen Zeilen.
+
+        :param stream: stderr des Prozesses.
+        :param on_progress: Optionale Coroutine-Funktion, die je Block ein Dict (key -> value) erhält.
+        :return: Fehlerausgabe ohne Fortschrittszeilen.
+        """
+        messages = []
+        block = {}
+        async for raw in stream:
+            line = raw.decode(errors='replace').strip()
+            key, sep, value = line.partition('=')
+            if on_progress is None or not sep or ' ' in key:
+                if line:
+                    messages.append(line)
+                continue
+            block[key] = value
+            # Jeder Fortschrittsblock endet mit progress=continue bzw. progress=end
+            if key == 'progress':
+                try:
+                    await on_progress(block)
+                except Exception:
+                    pass
+                block = {}
+        return '\n'.join(messages)
+
+    async def run(self, cmd: list[str], input: bytes | None = None, timeout: float | None = -1,
+                  on_progress=None) -> bytes:
+        """
+        Führt einen ffmpeg-/ffprobe-Befehl aus und liefert dessen stdout.
+
+        :param cmd: Befehl inkl. Programmname (wie bei subprocess.run).
+        :param input: Daten für stdin (None = keine Eingabe).
+        :param timeout: Zeitlimit in Sekunden (-1 = Standard des Runners, None = unbegrenzt).
+        :param on_progress: Optionale Coroutine-Funktion für Fortschrittsblöcke (nur ffmpeg),
+                            z.B. {'out_time_us': '1200000', 'speed': '2.1x', 'progress': 'continue'}.
+        :return: stdout des Prozesses als Bytes.
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        if on_progress is not None:
+            # Fortschritt über stderr, damit stdout für Ausgabedaten (pipe:1) frei bleibt
+            cmd = [cmd[0], '-progress', 'pipe:2', '-nostats', *cmd[1:]]
+        async with self._slots:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=PIPE_CHUNK
+            )
+            tasks = asyncio.gather(self._feed(proc, input), proc.stdout.read(),
+                                   self._read_stderr(proc.stderr, on_progress))
+            try:
+                _, stdout, stderr = await asyncio.wait_for(tasks, timeout)
+                returncode = await proc.wait()
+            except asyncio.TimeoutError:
+                await self._kill(proc)
+                raise TimeoutError(f'FFmpeg Zeitüberschreitung nach {timeout:g} s') from None
+            except BaseException:
+                # Abbruch (z.B. abgelaufene Interaction): Prozess nicht weiterlaufen lassen
+                tasks.cancel()
+                await self._kill(proc)
+                await asyncio.gather(tasks, return_exceptions=True)
+                raise
+        if returncode != 0:
+            raise FFmpegError(returncode, stderr)
+        return stdout
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process) -> None:
+        """
+        Beendet einen Prozess und wartet auf sein Ende.
+
+        :param proc: Laufender Prozess.
+        :return: None
+        """
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+
+ffmpeg_runner = FFmpegRunner()
@@ -1,60 +1,449 @@
 import cv2
 import numpy as np
+import asyncio
 import tempfile
-import subprocess
 import os
 from io import BytesIO
+from collections import deque
+from contextlib import contextmanager
 from PIL import Image
+from utils.ffmpeg_utils import ffmpeg_runner, FFmpegError
+
+# Gleichzeitige Medien-Jobs (ffmpeg nutzt selbst mehrere Threads, daher halbe Kernzahl)
+MEDIA_JOBS = int(os.getenv('MEDIA_JOBS', str(max(1, (os.cpu_count() or 1) // 2))))
+# Basisverzeichnis der Job-Arbeitsverzeichnisse
+MEDIA_TMP_DIR = os.getenv('MEDIA_TMP_DIR', tempfile.gettempdir())
+# Graustufen-Videos über stdin/stdout statt über temporäre Dateien verarbeiten
+MEDIA_STREAMING = os.getenv('MEDIA_STREAMING', '1') != '0'
+# Fragmentiertes MP4 lässt sich ohne Zurückspulen in eine Pipe schreiben
+FRAGMENTED_MP4 = ['-movflags', 'frag_keyframe+empty_moov', '-f', 'mp4']
+# Parallele Segment-Encoder je Video (1 = Segmentmodus aus)
+SEGMENT_WORKERS = int(os.getenv('SEGMENT_WORKERS', str(os.cpu_count() or 1)))
+# Mindestdauer (s) eines Videos für den Segmentmodus
+SEGMENT_MIN_SECONDS = float(os.getenv('SEGMENT_MIN_SECONDS', '60'))
+# Mindestlänge (s) eines Segments (geschnitten wird nur an Keyframes)
+SEGMENT_MIN_LENGTH = float(os.getenv('SEGMENT_MIN_LENGTH', '5'))
+# Ab dieser Größe (MB) prüft die Graustufen-Konvertierung, ob sich der Segmentmodus lohnt
+SEGMENT_MIN_MB = float(os.getenv('SEGMENT_MIN_MB', '16'))
+# Bild-Ausgabeformate: Name -> Dateiendung
+IMAGE_FORMATS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+# Standardqualität (1-100) für JPEG/WebP und PNG-Kompressionsstufe (0-9)
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '90'))
+PNG_COMPRESSION = int(os.getenv('PNG_COMPRESSION', '6'))
+# Untergrenze der Qualitätssuche bei Größenbudget
+IMAGE_MIN_QUALITY = int(os.getenv('IMAGE_MIN_QUALITY', '40'))
+
+
+@contextmanager
+def job_workspace(workdir: str | None = None):
+    """
+    Liefert ein Arbeitsverzeichnis für einen Medien-Job; ohne Vorgabe ein eigenes, das danach gelöscht wird.
+
+    :param workdir: Vorgegebenes Arbeitsverzeichnis (z.B. vom MediaJobScheduler) oder None.
+    :return: Context-Manager mit dem Verzeichnispfad.
+    """
+    if workdir is not None:
+        yield workdir
+        return
+    with tempfile.TemporaryDirectory(prefix='media_job_', dir=MEDIA_TMP_DIR) as temp_dir:
+        yield temp_dir
+
+
+def is_pipe_readable(data: bytes) -> bool:
+    """
+    Prüft, ob ffmpeg einen Container ohne Suchen von stdin lesen kann.
+
+    MP4/MOV mit moov-Atom hinter den Mediendaten (Standard vieler Kameras) brauchen eine seekbare Eingabe.
+
+    :param data: Eingabedatei als Bytes.
+    :return: False, wenn das moov-Atom erst nach mdat folgt, sonst True.
+    """
+    if data[4:8] != b'ftyp':
+        return True
+    pos = 0
+    while pos + 8 <= len(data):
+        size = int.from_bytes(data[pos:pos + 4], 'big')
+        box = data[pos + 4:pos + 8]
+        if box == b'moov' or box == b'moof':
+            return True
+        if box == b'mdat':
+            return False
+        if size == 1:
+            size = int.from_bytes(data[pos + 8:pos + 16], 'big')
+        if size < 8:
+            break
+        pos += size
+    return False
+
+
+def detect_image_format(data: bytes) -> str:
+    """
+    Ermittelt das Ausgabeformat passend zum Eingabebild.
+
+    :param data: Eingabebild als Bytes.
+    :return: 'jpeg' oder 'webp' für entsprechende Eingaben, sonst 'png' (z.B. für PNG und BMP).
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return 'png'
+
+
+def encode_image(img: np.ndarray, fmt: str, quality: int = IMAGE_QUALITY, compression: int = PNG_COMPRESSION,
+                 max_bytes: int | None = None) -> tuple[bytes, str]:
+    """
+    Kodiert ein Bild; mit Größenbudget wird die Qualität per Bisektion abgesenkt, bis das Ergebnis passt.
+
+    PNG ist verlustfrei: passt es auch mit höchster Kompression nicht, wird auf JPEG ausgewichen.
+
+    :param img: Bild (BGR oder Graustufen).
+    :param fmt: Ausgabeformat ('png', 'jpeg', 'webp').
+    :param quality: Qualität (1-100) für JPEG/WebP.
+    :param compression: Kompressionsstufe (0-9) für PNG.
+    :param max_bytes: Maximale Dateigröße in Bytes (None = unbegrenzt).
+    :return: Tuple(kodiertes Bild, Dateiendung ohne Punkt).
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f'Unbekanntes Bildformat: {fmt}')
+    ext = IMAGE_FORMATS[fmt]
+
+    def encode(q: int) -> bytes:
+        if fmt == 'png':
+            params = [cv2.IMWRITE_PNG_COMPRESSION, q]
+        elif fmt == 'jpeg':
+            params = [cv2.IMWRITE_JPEG_QUALITY, q, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        else:
+            params = [cv2.IMWRITE_WEBP_QUALITY, q]
+        ok, enc = cv2.imencode(f'.{ext}', img, params)
+        if not ok:
+            raise ValueError('Fehler beim Kodieren des Ergebnisbildes')
+        return enc.tobytes()
+
+    if fmt == 'png':
+        data = encode(min(max(compression, 0), 9))
+        if max_bytes is None or len(data) <= max_bytes:
+            return data, ext
+        if compression < 9:
+            data = encode(9)
+            if len(data) <= max_bytes:
+                return data, ext
+        return encode_image(img, 'jpeg', quality, compression, max_bytes)
+    quality = min(max(quality, 1), 100)
+    data = encode(quality)
+    if max_bytes is None or len(data) <= max_bytes:
+        return data, ext
+    # Höchste Qualität im Bereich [IMAGE_MIN_QUALITY, quality) suchen, die ins Budget passt
+    low, high, best = min(IMAGE_MIN_QUALITY, quality - 1), quality - 1, None
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = encode(mid)
+        if len(candidate) <= max_bytes:
+            best, low = candidate, mid + 1
+        else:
+            high = mid - 1
+    if best is None:
+        raise ValueError('Ergebnisbild überschreitet das Upload-Limit')
+    return best, ext
+
+
+def write_file(path: str, data: bytes) -> None:
+    """
+    Schreibt Bytes in eine Datei.
+
+    :param path: Zielpfad.
+    :param data: Inhalt.
+    :return: None
+    """
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read_file(path: str) -> bytes:
+    """
+    Liest eine Datei vollständig.
+
+    :param path: Pfad.
+    :return: Inhalt als Bytes.
+    """
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class MediaJobScheduler:
+    """
+    Führt Medien-Jobs mit begrenzter Parallelität in FIFO-Reihenfolge aus.
+
+    Jeder Job läuft mit eigenem temporären Arbeitsverzeichnis, das danach gelöscht wird; blockierende Funktionen
+    in einem Thread, Coroutine-Funktionen direkt im Event-Loop.
+    """
+    def __init__(self, max_jobs: int = MEDIA_JOBS, base_dir: str = MEDIA_TMP_DIR):
+        """
+        Initialisiert den Scheduler.
+
+        :param max_jobs: Maximale Anzahl gleichzeitig laufender Jobs.
+        :param base_dir: Basisverzeichnis der Arbeitsverzeichnisse.
+        :return: None
+        """
+        self.max_jobs = max(1, max_jobs)
+        self.base_dir = base_dir
+        self.running = 0
+        self._waiting = deque()
+
+    @property
+    def queued(self) -> int:
+        """
+        Anzahl wartender Jobs.
+
+        :return: Länge der Warteschlange.
+        """
+        return len(self._waiting)
+
+    def _dispatch(self) -> None:
+        """
+        Gibt freie Plätze in FIFO-Reihenfolge an wartende Jobs.
+
+        :return: None
+        """
+        while self.running < self.max_jobs and self._waiting:
+            ticket = self._waiting.popleft()
+            if not ticket.done():
+                self.running += 1
+                ticket.set_result(None)
+
+    def _release(self) -> None:
+        """
+        Gibt einen Platz frei und startet ggf. den nächsten Job.
+
+        :return: None
+        """
+        self.running -= 1
+        self._dispatch()
+
+    async def run(self, func, *args, on_queued=None, **kwargs):
+        """
+        Reiht einen Job ein und führt func(*args, workdir=..., **kwargs) aus, sobald ein Platz frei ist.
+
+        :param func: Blockierende Funktion oder Coroutine-Funktion mit Parameter workdir.
+        :param args: Positionsargumente.
+        :param on_queued: Optionale Coroutine-Funktion, die mit der Warteposition (ab 1) aufgerufen wird,
+                          falls der Job warten muss.
+        :param kwargs: Schlüsselwortargumente.
+        :return: Ergebnis von func.
+        """
+        loop = asyncio.get_running_loop()
+        ticket = loop.create_future()
+        self._waiting.append(ticket)
+        self._dispatch()
+        try:
+            if not ticket.done() and on_queued is not None:
+                try:
+                    await on_queued(len(self._waiting))
+                except Exception:
+                    # Fehlgeschlagene Wartemeldung soll den Job nicht verhindern
+                    pass
+            await ticket
+        except BaseException:
+            # Ticket entfernen bzw. bereits zugeteilten Platz freigeben, sonst bleibt er dauerhaft belegt
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            elif ticket.done() and not ticket.cancelled():
+                self._release()
+            raise
+
+        if asyncio.iscoroutinefunction(func):
+            # Asynchrone Jobs laufen im Event-Loop; ein Abbruch des Aufrufers bricht auch den Job ab
+            try:
+                with tempfile.TemporaryDirectory(prefix='media_job_', dir=self.base_dir) as workdir:
+                    return await func(*args, workdir=workdir, **kwargs)
+            finally:
+                self._release()
+
+        def job():
+            with tempfile.TemporaryDirectory(prefix='media_job_', dir=self.base_dir) as workdir:
+                return func(*args, workdir=workdir, **kwargs)
+
+        # Platz erst freigeben, wenn der Thread wirklich fertig ist (auch bei Abbruch des Aufrufers)
+        future = loop.run_in_executor(None, job)
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.shield(future)
+
+
+media_scheduler = MediaJobScheduler()
+
+class WatermarkPlan:
+    """
+    Einmal je Auftrag vorbereitetes Wasserzeichen für viele Frames gleicher Größe.
+
+    Hält das skalierte Wasserzeichen, ein vormultipliziertes Festkomma-Alpha (0–256) und die
+    ROI-Koordinaten; je Frame bleibt nur eine vektorisierte In-place-Überblendung der ROI.
+    """
+    def __init__(self, watermark: np.ndarray, frame_width: int, frame_height: int,
+                 position: str = 'center', scale: float = 1.0, transparency: float = 1.0):
+        """
+        Skaliert das Wasserzeichen und berechnet Alpha-Maske und Position.
+
+        :param watermark: Wasserzeichenbild (BGRA, BGR oder Graustufen) als Array.
+        :param frame_width: Breite der Frames.
+        :param frame_height: Höhe der Frames.
+        :param position: Position (top-left, center, etc.).
+        :param scale: Skalierungsfaktor.
+        :param transparency: Transparenz 0.0–1.0.
+        :return: None
+        """
+        if watermark.dtype == np.uint16:
+            watermark = (watermark >> 8).astype(np.uint8)
+        if watermark.ndim == 2:
+            watermark = cv2.cvtColor(watermark, cv2.COLOR_GRAY2BGR)
+        # Wasserzeichen einmalig skalieren, höchstens auf Framegröße
+        h_wm, w_wm = watermark.shape[:2]
+        nw = max(1, min(int(w_wm * scale), frame_width))
+        nh = max(1, min(int(h_wm * scale), frame_height))
+        wm = cv2.resize(watermark, (nw, nh), interpolation=cv2.INTER_AREA)
+        self.x, self.y = self.offset(position, frame_width, frame_height, nw, nh)
+        self.width, self.height = nw, nh
+        # Festkomma-Alpha 0–256 (256 = deckend), Transparenz eingerechnet
+        transparency = min(max(transparency, 0.0), 1.0)
+        if wm.shape[2] == 4:
+            alpha = wm[:, :, 3].astype(np.float32) * (256 / 255 * transparency)
+        else:
+            alpha = np.full((nh, nw), 256 * transparency, dtype=np.float32)
+        alpha = np.rint(alpha).astype(np.uint16)[:, :, None]
+        self.watermark = wm[:, :, :3]
+        self.alpha = alpha
+        # vormultipliziert inkl. Rundungsoffset: Ergebnis = (roi * (256 - a) + wm * a + 128) >> 8
+        self.premultiplied = self.watermark.astype(np.uint16) * alpha + 128
+        self.inverse_alpha = 256 - alpha
+        self._buf = np.empty((nh, nw, 3), dtype=np.uint16)
+
+    @staticmethod
+    def offset(position: str, frame_width: int, frame_height: int, width: int, height: int) -> tuple[int, int]:
+        """
+        Berechnet die linke obere Ecke des Wasserzeichens.
+
+        :param position: Position (top-left, top-right, bottom-left, bottom-right, center).
+        :param frame_width: Breite des Frames.
+        :param frame_height: Höhe des Frames.
+        :param width: Breite des Wasserzeichens.
+        :param height: Höhe des Wasserzeichens.
+        :return: Tuple(x, y).
+        """
+        pos_map = {
+            'top-left': (0, 0),
+            'top-right': (frame_width - width, 0),
+            'bottom-left': (0, frame_height - height),
+            'bottom-right': (frame_width - width, frame_height - height),
+            'center': ((frame_width - width) // 2, (frame_height - height) // 2)
+        }
+        return pos_map.get(position, pos_map['center'])
+
+    def to_png(self) -> bytes:
+        """
+        Kodiert das vorbereitete Wasserzeichen (skaliert, Transparenz im Alphakanal) als BGRA-PNG.
+
+        :return: PNG-Bytes.
+        """
+        alpha = np.minimum(np.rint(self.alpha * (255 / 256)), 255).astype(np.uint8)
+        ok, enc = cv2.imencode('.png', np.dstack([self.watermark, alpha]))
+        if not ok:
+            raise ValueError('Fehler beim Kodieren des Wasserzeichens')
+        return enc.tobytes()
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Blendet das Wasserzeichen in-place in einen BGR-Frame ein.
+
+        :param frame: Frame als uint8-Array (Höhe, Breite, 3).
+        :return: Derselbe Frame.
+        """
+        roi = frame[self.y:self.y + self.height, self.x:self.x + self.width]
+        np.multiply(roi, self.inverse_alpha, out=self._buf)
+        self._buf += self.premultiplied
+        self._buf >>= 8
+        np.copyto(roi, self._buf, casting='unsafe')
+        return frame
+
 
 class GraphicUtils:
     """
     Bietet Bild- und Videobearbeitungsfunktionen (Graustufen, Wasserzeichen).
     """
-    def convert_to_grayscale_image(self, image_bytes: bytes) -> bytes:
+    def convert_to_grayscale_image(self, image_bytes: bytes, output_format: str = 'auto',
+                                   quality: int = IMAGE_QUALITY, compression: int = PNG_COMPRESSION,
+                                   max_bytes: int | None = None) -> tuple[bytes, str]:
         """
         Wandelt ein Bild in Graustufen um.
 
         :param image_bytes: Eingabebild als Bytes.
-        :return: Graustufenbild als PNG-Bytes.
+        :param output_format: 'auto' (Format der Eingabe), 'png', 'jpeg' oder 'webp'.
+        :param quality: Qualität (1-100) für JPEG/WebP.
+        :param compression: Kompressionsstufe (0-9) für PNG.
+        :param max_bytes: Maximale Dateigröße in Bytes (None = unbegrenzt).
+        :return: Tuple(Graustufenbild, Dateiendung ohne Punkt).
         """
         # Bytes in NumPy-Array laden
         img_array = np.frombuffer(image_bytes, np.uint8)
-        # Bild dekodieren
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        # Graustufen konvertieren
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # Direkt als Graustufen dekodieren (keine Farbkonvertierung nötig)
+        gray = cv2.imdecode(img_array, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError('Ungültiges Bild')
         # Ergebnis kodieren
-        success, encoded = cv2.imencode('.png', gray)
-        if not success:
-            raise ValueError('Fehler bei der Bildkonvertierung')
-        return encoded.tobytes()
+        fmt = detect_image_format(image_bytes) if output_format == 'auto' else output_format
+        return encode_image(gray, fmt, quality, compression, max_bytes)
 
-    def convert_to_grayscale_video(self, video_bytes: bytes) -> bytes:
+    async def convert_to_grayscale_video(self, video_bytes: bytes, workdir: str | None = None,
+                                         streaming: bool = MEDIA_STREAMING, on_progress=None,
+                                         segment_workers: int = SEGMENT_WORKERS) -> bytes:
         """
         Wandelt ein Video in Graustufen um.
 
+        Im Streaming-Modus liest ffmpeg von stdin und schreibt fragmentiertes MP4 nach stdout, ohne Festplattenzugriff.
+        Braucht der Container eine seekbare Eingabe, wird nur die Eingabe als Datei im Arbeitsverzeichnis abgelegt.
+        Lange Videos (ab SEGMENT_MIN_MB) werden segmentweise parallel kodiert.
+
         :param video_bytes: Eingabevideo als Bytes.
+        :param workdir: Arbeitsverzeichnis des Jobs (None = eigenes temporäres Verzeichnis).
+        :param streaming: Ein-/Ausgabe über Pipes statt über Dateien.
+        :param on_progress: Optionale Coroutine-Funktion für ffmpeg-Fortschrittsblöcke.
+        :param segment_workers: Parallele Segment-Encoder (1 = immer ein Durchgang).
         :return: Graustufenvideo als MP4-Bytes.
         """
-        # Temporäre Dateien
-        temp_dir = tempfile.gettempdir()
-        in_file = os.path.join(temp_dir, 'sw_input.mp4')
-        out_file = os.path.join(temp_dir, 'sw_output.mp4')
-        # Video speichern
-        with open(in_file, 'wb') as f:
-            f.write(video_bytes)
         # FFmpeg Graustufen-Filter
-        cmd = [
-            'ffmpeg', '-y', '-i', in_file,
-            '-vf', 'format=gray', '-c:v', 'libx264', '-preset', 'fast',
-            '-c:a', 'copy', out_file
-        ]
-        result = subprocess.run(cmd, capture_output=True)
-        if result.returncode != 0:
-            raise Exception(f'FFmpeg Fehler: {result.stderr.decode()}')
-        # Ausgabedatei lesen
-        with open(out_file, 'rb') as f:
-            return f.read()
+        video_args = ['-vf', 'format=gray', '-c:v', 'libx264', '-preset', 'fast']
+        codec = [*video_args, '-c:a', 'copy']
+        if segment_workers > 1 and len(video_bytes) >= SEGMENT_MIN_MB * 2 ** 20:
+            with job_workspace(workdir) as temp_dir:
+                in_file = os.path.join(temp_dir, 'sw_input.mp4')
+                await asyncio.to_thread(write_file, in_file, video_bytes)
+                duration = (await asyncio.to_thread(self.video_info, in_file))[3]
+                if self.use_segments(duration, segment_workers):
+                    return await self.process_segments(in_file, temp_dir, duration, video_args, audio_codec='copy',
+                                                       workers=segment_workers, on_progress=on_progress)
+                return await ffmpeg_runner.run(['ffmpeg', '-y', '-i', in_file, *codec, *FRAGMENTED_MP4, 'pipe:1'],
+                                               on_progress=on_progress)
+        if streaming:
+            if is_pipe_readable(video_bytes):
+                try:
+                    result = await ffmpeg_runner.run(['ffmpeg', '-y', '-i', 'pipe:0', *codec, *FRAGMENTED_MP4,
+                                                      'pipe:1'], input=video_bytes, on_progress=on_progress)
+                    if result:
+                        return result
+                except FFmpegError:
+                    pass
+            # Fallback: Eingabe seekbar als Datei, Ausgabe weiter über die Pipe
+            with job_workspace(workdir) as temp_dir:
+                in_file = os.path.join(temp_dir, 'sw_input.mp4')
+                await asyncio.to_thread(write_file, in_file, video_bytes)
+                return await ffmpeg_runner.run(['ffmpeg', '-y', '-i', in_file, *codec, *FRAGMENTED_MP4, 'pipe:1'],
+                                               on_progress=on_progress)
+        with job_workspace(workdir) as temp_dir:
+            in_file = os.path.join(temp_dir, 'sw_input.mp4')
+            out_file = os.path.join(temp_dir, 'sw_output.mp4')
+            # Video speichern
+            await asyncio.to_thread(write_file, in_file, video_bytes)
+            await ffmpeg_runner.run(['ffmpeg', '-y', '-i', in_file, *codec, out_file], on_progress=on_progress)
+            # Ausgabedatei lesen
+            return await asyncio.to_thread(read_file, out_file)
 
     def add_watermark_image(self, image: np.ndarray, watermark: np.ndarray,
                             position: str = 'center', scale: float = 1.0,
@@ -69,111 +458,167 @@ class GraphicUtils:
         :param transparency: Transparenz 0.0–1.0.
         :return: Bild mit Wasserzeichen als Array.
         """
-        # Wasserzeichen skalieren
-        h_wm, w_wm = watermark.shape[:2]
-        nw, nh = int(w_wm * scale), int(h_wm * scale)
-        wm_resized = cv2.resize(watermark, (nw, nh), interpolation=cv2.INTER_AREA)
         h, w = image.shape[:2]
-        # Position berechnen
-        pos_map = {
-            'top-left': (0, 0),
-            'top-right': (w-nw, 0),
-            'bottom-left': (0, h-nh),
-            'bottom-right': (w-nw, h-nh),
-            'center': ((w-nw)//2, (h-nh)//2)
-        }
-        x, y = pos_map.get(position, pos_map['center'])
-        # ROI ausschneiden
-        roi = image[y:y+nh, x:x+nw]
-        # Alpha-Kanal extrahieren
-        if wm_resized.shape[2] == 4:
-            alpha = wm_resized[:, :, 3] / 255.0 * transparency
-            wm_rgb = wm_resized[:, :, :3]
-        else:
-            alpha = np.full((nh, nw), transparency, dtype=float)
-            wm_rgb = wm_resized
-        # Überlagerung
-        for c in range(3):
-            roi[:, :, c] = alpha * wm_rgb[:, :, c] + (1-alpha) * roi[:, :, c]
-        image[y:y+nh, x:x+nw] = roi
-        return image
+        return WatermarkPlan(watermark, w, h, position, scale, transparency).apply(image)
+
+    @staticmethod
+    def video_info(path: str) -> tuple[float, int, int, float]:
+        """
+        Liest Bildrate, Auflösung und Dauer eines Videos.
+
+        :param path: Pfad des Videos.
+        :return: Tuple(fps, Breite, Höhe, Dauer in Sekunden).
+        """
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        w_vid = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h_vid = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        cap.release()
+        duration = frames / fps if fps > 0 else 0.0
+        return fps, w_vid, h_vid, duration
+
+    @staticmethod
+    def use_segments(duration: float, workers: int) -> bool:
+        """
+        Entscheidet, ob ein Video segmentweise parallel verarbeitet wird.
 
-    def watermark_video_file(self, video_bytes: bytes, watermark_bytes: bytes,
-                             position: str, scale: float, transparency: float) -> bytes:
+        :param duration: Dauer in Sekunden.
+        :param workers: Anzahl paralleler Segment-Encoder.
+        :return: True für den Segmentmodus.
+        """
+        return workers > 1 and duration >= max(SEGMENT_MIN_SECONDS, 2 * SEGMENT_MIN_LENGTH)
+
+    async def process_segments(self, in_vid: str, temp_dir: str, duration: float, video_args: list[str],
+                               video_input: bytes | None = None, audio_codec: str = 'aac',
+                               workers: int = SEGMENT_WORKERS, on_progress=None) -> bytes:
+        """
+        Verarbeitet die Videospur segmentweise parallel und fügt sie ohne Neukodierung wieder zusammen.
+
+        Das Video wird per Stream-Copy an Keyframes geteilt, jedes Segment mit denselben Encoder-Einstellungen
+        kodiert und über den concat-Demuxer verbunden; die Tonspur wird aus dem Original übernommen.
+
+        :param in_vid: Pfad des Eingabevideos.
+        :param temp_dir: Arbeitsverzeichnis des Jobs.
+        :param duration: Dauer des Videos in Sekunden.
+        :param video_args: ffmpeg-Argumente je Segment (Filter + Video-Codec); zweite Eingabe ist ggf. pipe:0.
+        :param video_input: Optionale Daten für die zweite Eingabe (z.B. Wasserzeichen-PNG).
+        :param audio_codec: Codec der übernommenen Tonspur ('copy' = unverändert).
+        :param workers: Anzahl gleichzeitig kodierter Segmente.
+        :param on_progress: Optionale Coroutine-Funktion für den summierten Fortschritt.
+        :return: Fertiges Video als MP4-Bytes.
+        """
+        seg_dir = os.path.join(temp_dir, 'segments')
+        os.makedirs(seg_dir, exist_ok=True)
+        # Schneiden an Keyframes ohne Neukodierung; etwa zwei Segmente je Worker für gleichmäßige Auslastung
+        seg_time = max(SEGMENT_MIN_LENGTH, duration / (2 * workers))
+        await ffmpeg_runner.run([
+            'ffmpeg', '-v', 'error', '-y', '-i', in_vid, '-map', '0:v:0', '-c', 'copy',
+            '-f', 'segment', '-segment_time', f'{seg_time:.3f}', '-reset_timestamps', '1',
+            os.path.join(seg_dir, 'in_%04d.mp4')
+        ])
+        segments = sorted(f for f in os.listdir(seg_dir) if f.startswith('in_'))
+        threads = str(max(1, (os.cpu_count() or 1) // workers))
+        slots = asyncio.Semaphore(workers)
+        done = [0] * len(segments)
+
+        async def encode(index: int, name: str) -> str:
+            seg_out = os.path.join(seg_dir, name.replace('in_', 'out_'))
+
+            async def progress(block: dict):
+                value = block.get('out_time_us', '')
+                if value.isdigit():
+                    done[index] = int(value)
+                await on_progress({'out_time_us': str(sum(done)), 'speed': f'{len(segments)} Segmente',
+                                   'progress': 'continue'})
+
+            cmd = ['ffmpeg', '-v', 'error', '-y', '-i', os.path.join(seg_dir, name)]
+            if video_input is not None:
+                cmd += ['-f', 'png_pipe', '-i', 'pipe:0']
+            cmd += [*video_args, '-threads', threads, '-an', seg_out]
+            async with slots:
+                await ffmpeg_runner.run(cmd, input=video_input,
+                                        on_progress=progress if on_progress is not None else None)
+            return seg_out
+
+        outputs = await asyncio.gather(*(encode(i, name) for i, name in enumerate(segments)))
+        # Segmente verbinden (concat-Demuxer, Stream-Copy) und Tonspur des Originals übernehmen
+        list_file = os.path.join(temp_dir, 'segments.txt')
+        await asyncio.to_thread(write_file, list_file,
+                                ''.join(f"file '{path}'\n" for path in outputs).encode())
+        out_vid = os.path.join(temp_dir, 'segments_out.mp4')
+        await ffmpeg_runner.run([
+            'ffmpeg', '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-i', in_vid,
+            '-map', '0:v:0', '-map', '1:a?', '-c:v', 'copy', '-c:a', audio_codec, '-movflags', '+faststart', out_vid
+        ])
+        return await asyncio.to_thread(read_file, out_vid)
+
+    async def watermark_video_file(self, video_bytes: bytes, watermark_bytes: bytes,
+                                   position: str, scale: float, transparency: float,
+                                   workdir: str | None = None, on_progress=None,
+                                   segment_workers: int = SEGMENT_WORKERS) -> bytes:
         """
         Fügt Wasserzeichen zu Video hinzu (GIF oder statisch).
 
+        Lange Videos mit statischem Wasserzeichen werden segmentweise parallel kodiert.
+
         :param video_bytes: Eingabevideo als Bytes.
         :param watermark_bytes: Wasserzeichen-Datei als Bytes.
         :param position: Position des Wasserzeichens.
         :param scale: Skalierung.
         :param transparency: Transparenz.
+        :param workdir: Arbeitsverzeichnis des Jobs (None = eigenes temporäres Verzeichnis).
+        :param on_progress: Optionale Coroutine-Funktion für ffmpeg-Fortschrittsblöcke.
+        :param segment_workers: Parallele Segment-Encoder (1 = immer ein Durchgang).
         :return: Video mit Wasserzeichen als Bytes.
         """
-        temp_dir = tempfile.gettempdir()
-        in_vid = os.path.join(temp_dir, 'wm_in.mp4')
-        temp_vid = os.path.join(temp_dir, 'wm_temp.mp4')
-        out_vid = os.path.join(temp_dir, 'wm_out.mp4')
-        # Bytes speichern
-        with open(in_vid, 'wb') as f:
-            f.write(video_bytes)
-        # GIF-Wasserzeichen
-        if watermark_bytes[:6] in (b'GIF87a', b'GIF89a'):
-            gif_file = os.path.join(temp_dir, 'wm.gif')
-            with open(gif_file, 'wb') as f:
-                f.write(watermark_bytes)
+        with job_workspace(workdir) as temp_dir:
+            in_vid = os.path.join(temp_dir, 'wm_in.mp4')
+            out_vid = os.path.join(temp_dir, 'wm_out.mp4')
+            # Bytes speichern
+            await asyncio.to_thread(write_file, in_vid, video_bytes)
             # Video-Metadaten
-            cap = cv2.VideoCapture(in_vid)
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            w_vid = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            h_vid = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            cap.release()
-            # GIF-Overlay via FFmpeg
-            im = Image.open(BytesIO(watermark_bytes))
-            w_gif, h_gif = im.size
-            w_g, h_g = int(w_gif*scale), int(h_gif*scale)
-            coords = {
-                'top-left': (0,0), 'top-right': (w_vid-w_g,0),
-                'bottom-left': (0,h_vid-h_g), 'bottom-right': (w_vid-w_g,h_vid-h_g),
-                'center': ((w_vid-w_g)//2,(h_vid-h_g)//2)
-            }
-            x, y = coords.get(position, coords['center'])
-            cmd = [
-                'ffmpeg','-y','-i',in_vid,'-ignore_loop','0','-i',gif_file,
-                '-filter_complex',f'overlay={x}:{y}:shortest=1',
-                '-c:v','libx264','-preset','veryfast','-c:a','aac',out_vid
-            ]
-            res = subprocess.run(cmd, capture_output=True)
-            if res.returncode != 0:
-                raise Exception(f'FFmpeg Error: {res.stderr.decode()}')
-        else:
-            # Statisches Wasserzeichen auf Frames
-            wm_arr = np.frombuffer(watermark_bytes, np.uint8)
-            wm_img = cv2.imdecode(wm_arr, cv2.IMREAD_UNCHANGED)
-            cap = cv2.VideoCapture(in_vid)
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            w_vid = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            h_vid = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            out_temp = cv2.VideoWriter(temp_vid, fourcc, fps, (w_vid, h_vid))
-            # Frame-Loop
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                frm = self.add_watermark_image(frame, wm_img, position, scale, transparency)
-                out_temp.write(frm)
-            cap.release()
-            out_temp.release()
-            # Audio beibehalten
-            cmd2 = ['ffmpeg','-y','-i',temp_vid,'-i',in_vid,'-c:v','libx264','-preset','veryfast','-c:a','aac',out_vid]
-            subprocess.run(cmd2, capture_output=True)
-        # Ausgabedatei lesen
-        with open(out_vid, 'rb') as f:
-            return f.read()
+            _, w_vid, h_vid, duration = await asyncio.to_thread(self.video_info, in_vid)
+            # GIF-Wasserzeichen
+            if watermark_bytes[:6] in (b'GIF87a', b'GIF89a'):
+                gif_file = os.path.join(temp_dir, 'wm.gif')
+                await asyncio.to_thread(write_file, gif_file, watermark_bytes)
+                # GIF-Overlay via FFmpeg
+                im = Image.open(BytesIO(watermark_bytes))
+                w_gif, h_gif = im.size
+                w_g, h_g = int(w_gif*scale), int(h_gif*scale)
+                x, y = WatermarkPlan.offset(position, w_vid, h_vid, w_g, h_g)
+                cmd = [
+                    'ffmpeg','-y','-i',in_vid,'-ignore_loop','0','-i',gif_file,
+                    '-filter_complex',f'overlay={x}:{y}:shortest=1',
+                    '-c:v','libx264','-preset','veryfast','-c:a','aac',out_vid
+                ]
+                await ffmpeg_runner.run(cmd, on_progress=on_progress)
+            else:
+                # Statisches Wasserzeichen: einmal vorbereiten, dann ein ffmpeg-Durchgang mit overlay
+                wm_arr = np.frombuffer(watermark_bytes, np.uint8)
+                wm_img = cv2.imdecode(wm_arr, cv2.IMREAD_UNCHANGED)
+                if wm_img is None:
+                    raise ValueError('Ungültiges Wasserzeichen')
+                plan = WatermarkPlan(wm_img, w_vid, h_vid, position, scale, transparency)
+                overlay = ['-filter_complex', f'[0:v][1:v]overlay={plan.x}:{plan.y}[v]', '-map', '[v]',
+                           '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p']
+                if self.use_segments(duration, segment_workers):
+                    return await self.process_segments(in_vid, temp_dir, duration, overlay, plan.to_png(),
+                                                       workers=segment_workers, on_progress=on_progress)
+                # vorbereitetes PNG über stdin: keine Zwischendatei, nur eine Kodierung
+                cmd = [
+                    'ffmpeg', '-y', '-v', 'error', '-i', in_vid, '-f', 'png_pipe', '-i', 'pipe:0',
+                    *overlay, '-map', '0:a?', '-c:a', 'aac', out_vid
+                ]
+                await ffmpeg_runner.run(cmd, input=plan.to_png(), on_progress=on_progress)
+            # Ausgabedatei lesen
+            return await asyncio.to_thread(read_file, out_vid)
 
     def watermark_image_file(self, image_bytes: bytes, watermark_bytes: bytes,
-                             position: str, scale: float, transparency: float) -> bytes:
+                             position: str, scale: float, transparency: float, output_format: str = 'auto',
+                             quality: int = IMAGE_QUALITY, compression: int = PNG_COMPRESSION,
+                             max_bytes: int | None = None) -> tuple[bytes, str]:
         """
         Fügt Wasserzeichen zu Bild hinzu.
 
@@ -182,7 +627,11 @@ class GraphicUtils:
         :param position: Position.
         :param scale: Skalierung.
         :param transparency: Transparenz.
-        :return: Bild mit Wasserzeichen als PNG-Bytes.
+        :param output_format: 'auto' (Format der Eingabe), 'png', 'jpeg' oder 'webp'.
+        :param quality: Qualität (1-100) für JPEG/WebP.
+        :param compression: Kompressionsstufe (0-9) für PNG.
+        :param max_bytes: Maximale Dateigröße in Bytes (None = unbegrenzt).
+        :return: Tuple(Bild mit Wasserzeichen, Dateiendung ohne Punkt).
         """
         # Bytes dekodieren
         in_arr = np.frombuffer(image_bytes, np.uint8)
@@ -194,7 +643,5 @@ class GraphicUtils:
         # Wasserzeichen anwenden
         res = self.add_watermark_image(in_img, wm_img, position, scale, transparency)
         # Ergebnis kodieren
-        ok, enc = cv2.imencode('.png', res)
-        if not ok:
-            raise ValueError('Fehler beim Kodieren des Ergebnisbildes')
-        return enc.tobytes()
\ No newline at end of file
+        fmt = detect_image_format(image_bytes) if output_format == 'auto' else output_format
+        return encode_image(res, fmt, quality, compression, max_bytes)